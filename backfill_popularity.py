@@ -0,0 +1,22 @@
+from configure.db import connect_db
+from configure.indexes import create_indexes
+from services.popularity import rebuild_popularity, SALES_COLLECTION
+
+# Rebuild products.totalSold and the daily product_sales buckets from the orders collection
+def run():
+    try:
+        db = connect_db()
+
+        result = rebuild_popularity(db)
+        print(f"[OK] Popularity rebuilt for {result['products']} products")
+
+        create_indexes(db, collections=[SALES_COLLECTION])
+        print(f"[OK] Indexes ensured on {SALES_COLLECTION}")
+    except Exception as err:
+        print(f"[ERROR] Backfill error: {err}")
+        import traceback
+        traceback.print_exc()
+        exit(1)
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,70 @@
+import time
+import argparse
+import numpy as np
+from services.ranking import RankWeights, score, top_k
+
+# Previous ranking stage: a new dict per product, scores in a Python loop, then a full sort
+def rank_before(products, budget, limit, skip=0):
+    max_pop = max([0] + [p['popularity'] for p in products])
+    enriched = []
+    for p in products:
+        pop = p['popularity']
+        sim = p.get('score', 0) / 10 if p.get('score') else 0.5
+        pop_score = pop / max_pop if max_pop else 0
+        price_score = 1 - abs(p['price'] - budget) / max(budget, 1) if budget else 1
+        final_score = 0.4 * sim + 0.4 * pop_score + 0.2 * price_score
+        enriched.append({**p, "popularity": pop, "simScore": sim, "finalScore": final_score})
+    enriched.sort(key=lambda x: x.get('finalScore', 0), reverse=True)
+    return enriched[skip:skip + limit]
+
+# Vectorized scores over the candidate arrays, full lexsort of every candidate
+def rank_full_sort(sim, popularity, price, tie_rank, budget, limit, skip=0):
+    _, final = score(sim, popularity, price, budget, RankWeights())
+    return np.lexsort((tie_rank, -final))[skip:skip + limit]
+
+# Vectorized scores plus partial selection of the requested page
+def rank_after(sim, popularity, price, tie_rank, budget, limit, skip=0):
+    _, final = score(sim, popularity, price, budget, RankWeights())
+    return top_k(final, -1, tie_rank, limit, skip)
+
+def bench(fn, rounds: int, *args) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn(*args)
+    return (time.perf_counter() - start) / rounds
+
+def run():
+    parser = argparse.ArgumentParser(description="Search ranking stage cost by candidate-set size")
+    parser.add_argument('--sizes', default="10000,100000,1000000", help="Comma-separated candidate counts")
+    parser.add_argument('--limit', type=int, default=20, help="Page size")
+    parser.add_argument('--skip', type=int, default=0)
+    parser.add_argument('--budget', type=float, default=300.0)
+    parser.add_argument('--rounds', type=int, default=20)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    print(f"Page of {args.limit} after {args.skip}, budget {args.budget}, {args.rounds} rounds")
+    print(f"{'candidates':>11} {'python loop':>13} {'numpy + sort':>13} {'numpy + top_k':>14} {'speedup':>8}")
+    for size in [int(part) for part in args.sizes.split(',')]:
+        score_raw = rng.uniform(0.5, 8, size)
+        popularity = rng.integers(0, 500, size).astype(np.float64)
+        price = rng.uniform(5, 2500, size).round(2)
+        tie_rank = rng.permutation(size)
+        sim = score_raw / 10
+        products = [{"_id": i, "score": float(score_raw[i]), "popularity": int(popularity[i]),
+                     "price": float(price[i])} for i in range(size)]
+
+        # Same page either way (random float scores make exact ties practically impossible)
+        expected = [p["_id"] for p in rank_before(products, args.budget, args.limit, args.skip)]
+        got = rank_after(sim, popularity, price, tie_rank, args.budget, args.limit, args.skip)
+        assert expected == got.tolist()
+
+        rounds = max(1, args.rounds // 10) if size >= 1_000_000 else args.rounds
+        before = bench(rank_before, rounds, products, args.budget, args.limit, args.skip)
+        full = bench(rank_full_sort, args.rounds, sim, popularity, price, tie_rank, args.budget, args.limit, args.skip)
+        after = bench(rank_after, args.rounds, sim, popularity, price, tie_rank, args.budget, args.limit, args.skip)
+        print(f"{size:>11,} {before * 1e3:>10.2f} ms {full * 1e3:>10.2f} ms {after * 1e3:>11.2f} ms "
+              f"{before / after:>7.0f}x")
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,71 @@
+import time
+import argparse
+from datetime import datetime
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from utils.serializer import dumps
+
+# Previous response path: recursive ObjectId conversion, FastAPI's jsonable_encoder, then json.dumps
+def convert_objectids(doc):
+    """Recursively convert all ObjectId instances to strings in a document"""
+    if isinstance(doc, dict):
+        return {k: convert_objectids(v) for k, v in doc.items()}
+    elif isinstance(doc, list):
+        return [convert_objectids(item) for item in doc]
+    elif isinstance(doc, ObjectId):
+        return str(doc)
+    else:
+        return doc
+
+def encode_before(content) -> bytes:
+    return JSONResponse(jsonable_encoder(convert_objectids(content))).body
+
+def encode_after(content) -> bytes:
+    return dumps(content)
+
+# A populated order as returned by GET /users/{id}/orders
+def make_order(items_per_order: int):
+    return {
+        "_id": ObjectId(),
+        "user": ObjectId(),
+        "items": [
+            {
+                "product": {"_id": ObjectId(), "name": f"Product {i}", "brand": "Brand", "price": 19.99 + i},
+                "name": f"Product {i}",
+                "price": 19.99 + i,
+                "quantity": 1 + i % 3
+            }
+            for i in range(items_per_order)
+        ],
+        "totalCost": 123.45,
+        "status": "placed",
+        "createdAt": datetime.utcnow()
+    }
+
+def bench(fn, content, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn(content)
+    return (time.perf_counter() - start) / rounds
+
+def run():
+    parser = argparse.ArgumentParser(description="Per-document JSON encode cost, before and after")
+    parser.add_argument('--docs', type=int, default=50, help="Orders per response")
+    parser.add_argument('--items', type=int, default=5, help="Items per order")
+    parser.add_argument('--rounds', type=int, default=200)
+    args = parser.parse_args()
+
+    content = {"limit": args.docs, "next_cursor": None,
+               "results": [make_order(args.items) for _ in range(args.docs)]}
+    assert encode_before(content) == encode_after(content)
+
+    before = bench(encode_before, content, args.rounds)
+    after = bench(encode_after, content, args.rounds)
+    print(f"Response of {args.docs} orders x {args.items} items, {args.rounds} rounds")
+    print(f"before (convert_objectids + jsonable_encoder + json): {before / args.docs * 1e6:8.2f} us/doc")
+    print(f"after  (orjson with ObjectId default):                {after / args.docs * 1e6:8.2f} us/doc")
+    print(f"speedup: {before / after:.1f}x")
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,68 @@
+import os
+import sys
+import argparse
+import statistics
+import subprocess
+from configure.settings import settings
+
+# Imports `main` and builds a second app in a fresh interpreter; prints the factory time (seconds)
+PROBE = "import time, main; started = time.perf_counter(); main.create_app(); print(time.perf_counter() - started)"
+
+# One cold start: `python -X importtime` output -> (per-module self/cumulative microseconds, create_app seconds)
+def measure(python: str, env: dict):
+    result = subprocess.run([python, '-X', 'importtime', '-c', PROBE], capture_output=True, text=True,
+                            env=env, cwd=os.getcwd())
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules, float(result.stdout.strip().splitlines()[-1])
+
+# Self time summed per top-level package (fastapi, pymongo, routes, ...)
+def by_package(modules: dict) -> dict:
+    totals = {}
+    for name, (self_us, _) in modules.items():
+        package = name.split('.')[0]
+        totals[package] = totals.get(package, 0) + self_us
+    return totals
+
+def run():
+    parser = argparse.ArgumentParser(description="Cold-start import cost of the API (python -X importtime)")
+    parser.add_argument('--runs', type=int, default=5, help="Fresh interpreters to measure")
+    parser.add_argument('--top', type=int, default=12, help="Packages to list")
+    parser.add_argument('--budget-ms', type=float, default=None,
+                        help="Exit with status 1 when the median `import main` exceeds this")
+    args = parser.parse_args()
+
+    runs = [measure(sys.executable, dict(os.environ)) for _ in range(args.runs)]
+    totals = [modules['main'][1] / 1000 for modules, _ in runs if 'main' in modules]
+    factory = [seconds * 1000 for _, seconds in runs]
+    packages = {}
+    for modules, _ in runs:
+        for package, self_us in by_package(modules).items():
+            packages.setdefault(package, []).append(self_us / 1000)
+
+    median_import = statistics.median(totals)
+    print(f"import main: median {median_import:.1f} ms (min {min(totals):.1f}, max {max(totals):.1f}) "
+          f"over {args.runs} runs")
+    print(f"create_app(): median {statistics.median(factory):.2f} ms")
+    print(f"\n{'package':<24} {'self ms':>9}")
+    ranked = sorted(packages.items(), key=lambda item: -statistics.median(item[1]))
+    for package, samples in ranked[:args.top]:
+        print(f"{package:<24} {statistics.median(samples):>9.1f}")
+
+    # numpy only belongs in the import graph with SEARCH_ENGINE=memory
+    if 'numpy' in packages and settings.search_engine != 'memory':
+        print("[WARN] numpy is imported at startup although SEARCH_ENGINE is not memory")
+    if args.budget_ms is not None:
+        if median_import > args.budget_ms:
+            print(f"[ERROR] import main {median_import:.1f} ms exceeds the {args.budget_ms:.0f} ms budget")
+            exit(1)
+        print(f"[OK] import main within the {args.budget_ms:.0f} ms budget")
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,298 @@
+import os
+import sys
+import json
+import math
+import time
+import random
+import shutil
+import socket
+import asyncio
+import argparse
+import platform
+import resource
+import tempfile
+import subprocess
+from contextlib import contextmanager
+from datetime import datetime
+from pymongo import MongoClient, monitoring
+from benchmarks import synthetic
+
+BENCH_DB_NAME = "EcommerceBench"
+
+# =============================
+# Mongo round trips: every command the application's clients send
+# =============================
+class CommandCounter(monitoring.CommandListener):
+    def __init__(self):
+        self.count = 0
+
+    def started(self, event):
+        self.count += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+# Peak resident set size of this process so far, in MB
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+# =============================
+# Throwaway local mongod
+# =============================
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+@contextmanager
+def throwaway_mongod(binary: str = 'mongod', timeout: float = 30):
+    path = shutil.which(binary)
+    if not path:
+        raise FileNotFoundError(f"{binary} not found on PATH; pass --mongo-uri instead")
+    dbpath = tempfile.mkdtemp(prefix='ecommerce-bench-')
+    port = free_port()
+    process = subprocess.Popen([path, '--dbpath', dbpath, '--port', str(port), '--bind_ip', '127.0.0.1'],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    uri = f"mongodb://127.0.0.1:{port}/"
+    try:
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                with MongoClient(uri, serverSelectionTimeoutMS=500) as probe:
+                    probe.admin.command('ping')
+                break
+            except Exception:
+                if process.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError(f"mongod did not start on port {port}")
+        print(f"[OK] Throwaway mongod on port {port} ({dbpath})")
+        yield uri
+    finally:
+        process.terminate()
+        process.wait(timeout=timeout)
+        shutil.rmtree(dbpath, ignore_errors=True)
+
+# =============================
+# Scenarios: one request per call, parameters drawn from the generated data
+# =============================
+def sample_ids(db, size: int = 500) -> dict:
+    def ids(collection):
+        return [doc['_id'] for doc in db[collection].aggregate([{"$sample": {"size": size}},
+                                                               {"$project": {"_id": 1}}])]
+    return {
+        "products": [str(i) for i in ids('products')],
+        "users": [str(i) for i in ids('users')],
+        "orders": [str(i) for i in ids('orders')],
+    }
+
+def search_request(rng, ids):
+    params = {"query": f"{rng.choice(synthetic.ADJECTIVES)} {rng.choice(synthetic.WORDS)}",
+              "sort": rng.choice(["relevance", "price_asc", "popularity"]), "limit": 20}
+    if rng.random() < 0.5:
+        params["category"] = rng.choice(synthetic.CATEGORIES)
+    if rng.random() < 0.3:
+        params["minPrice"], params["maxPrice"] = 50, 800
+    return "GET", "/products/search", {"params": params}
+
+def browse_request(rng, ids):
+    params = {"category": rng.choice(synthetic.CATEGORIES), "sort": "price_asc", "limit": 20}
+    return "GET", "/products/search", {"params": params}
+
+def top_products_request(rng, ids):
+    return "GET", "/orders/top-products", {"params": {"days": rng.choice([7, 30, 90]), "limit": 5}}
+
+def order_request(rng, ids):
+    return "GET", f"/orders/{rng.choice(ids['orders'])}", {}
+
+def user_orders_request(rng, ids):
+    return "GET", f"/users/{rng.choice(ids['users'])}/orders", {"params": {"limit": 20}}
+
+def reviews_request(rng, ids):
+    return "GET", f"/products/{rng.choice(ids['products'])}/reviews", {"params": {"limit": 20}}
+
+def post_review_request(rng, ids):
+    body = {"user": rng.choice(ids['users']), "product": rng.choice(ids['products']),
+            "rating": rng.randint(1, 5), "text": "benchmark review"}
+    return "POST", f"/products/{body['product']}/reviews", {"json": body}
+
+SCENARIOS = {
+    "search": search_request,
+    "search-browse": browse_request,
+    "top-products": top_products_request,
+    "order-by-id": order_request,
+    "user-orders": user_orders_request,
+    "reviews-get": reviews_request,
+    "reviews-post": post_review_request,
+}
+
+# =============================
+# Runner
+# =============================
+def percentile(sorted_values, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    # Nearest-rank percentile
+    index = max(0, math.ceil(pct / 100 * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+async def run_scenario(client, make_request, ids, requests: int, concurrency: int, warmup: int,
+                       counter: CommandCounter, seed: int):
+    rng = random.Random(seed)
+    for _ in range(warmup):
+        method, url, kwargs = make_request(rng, ids)
+        await client.request(method, url, **kwargs)
+
+    plan = [make_request(rng, ids) for _ in range(requests)]
+    latencies = []
+    errors = 0
+    commands_before = counter.count
+
+    async def worker(offset):
+        nonlocal errors
+        for method, url, kwargs in plan[offset::concurrency]:
+            start = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(offset) for offset in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3) if latencies else 0.0,
+        "throughput_rps": round(requests / elapsed, 1) if elapsed else 0.0,
+        "mongo_round_trips_per_request": round((counter.count - commands_before) / requests, 2),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+async def run_load(scenarios, ids, args, counter: CommandCounter) -> dict:
+    import httpx
+    from main import app
+
+    results = {}
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for name in scenarios:
+                results[name] = await run_scenario(client, SCENARIOS[name], ids, args.requests,
+                                                   args.concurrency, args.warmup, counter, args.seed)
+                r = results[name]
+                print(f"[OK] {name:14} p50 {r['p50_ms']:8.2f} ms  p95 {r['p95_ms']:8.2f} ms  "
+                      f"p99 {r['p99_ms']:8.2f} ms  {r['throughput_rps']:8.1f} req/s  "
+                      f"{r['mongo_round_trips_per_request']:5.2f} trips/req  errors {r['errors']}")
+    return results
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return None
+
+# Print p50/p95/throughput changes against an earlier JSON report
+def compare(report: dict, baseline_path: str):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\nChange vs {baseline['meta'].get('commit')} ({baseline_path}):")
+    for name, result in report["endpoints"].items():
+        before = baseline["endpoints"].get(name)
+        if not before:
+            continue
+        deltas = []
+        for key in ("p50_ms", "p95_ms", "throughput_rps"):
+            if before[key]:
+                deltas.append(f"{key} {(result[key] - before[key]) / before[key] * 100:+6.1f}%")
+        print(f"  {name:14} " + "  ".join(deltas))
+
+# An already running server, used as-is
+@contextmanager
+def _existing(uri: str):
+    yield uri
+
+def run():
+    parser = argparse.ArgumentParser(description="In-process load test of every endpoint")
+    synthetic.add_arguments(parser)
+    parser.add_argument('--mongo-uri', default=None, help="Existing server (default: throwaway mongod)")
+    parser.add_argument('--mongod', default='mongod', help="mongod binary for the throwaway server")
+    parser.add_argument('--db-name', default=BENCH_DB_NAME)
+    parser.add_argument('--skip-generate', action='store_true', help="Reuse the data already in --db-name")
+    parser.add_argument('--scenarios', default=",".join(SCENARIOS),
+                        help=f"Comma-separated subset of: {', '.join(SCENARIOS)}")
+    parser.add_argument('--requests', type=int, default=500, help="Requests per scenario")
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--cache', action='store_true', help="Keep the response cache enabled")
+    parser.add_argument('--output', default=None, help="Write the JSON report here")
+    parser.add_argument('--baseline', default=None, help="Earlier JSON report to compare against")
+    args = parser.parse_args()
+
+    scenarios = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = [name for name in scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+    if args.db_name == "Ecommerce" and not args.skip_generate:
+        parser.error("refusing to overwrite the Ecommerce database; choose another --db-name")
+
+    try:
+        with (throwaway_mongod(args.mongod) if not args.mongo_uri else _existing(args.mongo_uri)) as uri:
+            # Configure the application before it is imported: database, and a bypassed cache
+            os.environ['MONGO_URI'] = uri
+            os.environ['MONGO_DB_NAME'] = args.db_name
+            if not args.cache:
+                for name in ('CACHE_TTL_SEARCH', 'CACHE_TTL_REVIEWS', 'CACHE_TTL_TOP_PRODUCTS', 'CACHE_LOCAL_TTL',
+                             'PRODUCT_SUMMARY_TTL'):
+                    os.environ[name] = '0'
+
+            db = MongoClient(uri)[args.db_name]
+            dataset = synthetic.dataset_options(args)
+            if not args.skip_generate:
+                started = time.perf_counter()
+                synthetic.generate(db, **dataset)
+                print(f"[OK] Dataset generated in {time.perf_counter() - started:.1f}s")
+            ids = sample_ids(db)
+
+            # Registered globally so the application's clients, created at startup, report to it
+            counter = CommandCounter()
+            monitoring.register(counter)
+            endpoints = asyncio.run(run_load(scenarios, ids, args, counter))
+
+            report = {
+                "meta": {
+                    "commit": git_commit(),
+                    "timestamp": datetime.utcnow().isoformat(timespec='seconds'),
+                    "python": platform.python_version(),
+                    "mongodb": db.client.server_info().get('version'),
+                    "dataset": dataset,
+                    "requests": args.requests,
+                    "concurrency": args.concurrency,
+                    "cache": args.cache,
+                },
+                "endpoints": endpoints,
+                "peak_rss_mb": round(peak_rss_mb(), 1),
+            }
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(report, f, indent=2, sort_keys=True)
+            print(f"[OK] Report written to {args.output}")
+        if args.baseline:
+            compare(report, args.baseline)
+    except Exception as err:
+        print(f"[ERROR] Load test error: {err}")
+        import traceback
+        traceback.print_exc()
+        exit(1)
+
+if __name__ == '__main__':
+    run()
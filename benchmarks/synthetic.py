@@ -0,0 +1,192 @@
+import random
+import argparse
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo import UpdateOne
+from configure.indexes import create_indexes
+from services.popularity import rebuild_popularity, SALES_COLLECTION
+
+# Vocabulary for generated catalog records, in the shape of data/products.json
+CATEGORIES = ["Laptops", "Audio", "Phones", "Accessories", "Monitors", "Cameras", "Gaming", "Storage"]
+BRANDS = ["HP", "Dell", "Apple", "Logitech", "Samsung", "Sony", "Lenovo", "Asus", "Anker", "Bose"]
+NOUNS = {
+    "Laptops": ["Laptop", "Notebook", "Ultrabook"],
+    "Audio": ["Earbuds", "Headphones", "Speaker"],
+    "Phones": ["Phone", "Smartphone"],
+    "Accessories": ["Mouse", "Keyboard", "Charger", "Cable"],
+    "Monitors": ["Monitor", "Display"],
+    "Cameras": ["Camera", "Webcam"],
+    "Gaming": ["Controller", "Console", "Headset"],
+    "Storage": ["SSD", "Drive", "Card"],
+}
+ADJECTIVES = ["Wireless", "Pro", "Ultra", "Compact", "Portable", "Noise-cancelling", "Gaming",
+              "Slim", "Mini", "Max", "Smart", "Fast"]
+WORDS = ["inch", "battery", "bluetooth", "usb-c", "rgb", "4k", "hdr", "ram", "ssd", "charging",
+         "ergonomic", "lightweight", "waterproof", "premium", "budget", "quiet", "fast", "durable"]
+STATUSES = ["placed", "shipped", "delivered", "cancelled"]
+
+COLLECTIONS = ['products', 'users', 'orders', 'reviews', SALES_COLLECTION, 'imports']
+
+def make_product(rng: random.Random, i: int, now: datetime):
+    category = rng.choice(CATEGORIES)
+    brand = rng.choice(BRANDS)
+    noun = rng.choice(NOUNS[category])
+    return {
+        "_id": ObjectId(),
+        "name": f"{brand} {rng.choice(ADJECTIVES)} {noun} {i}",
+        "description": " ".join(rng.choices(WORDS, k=8)) + f" {noun.lower()}",
+        "category": category,
+        "brand": brand,
+        "price": round(rng.uniform(5, 2500), 2),
+        "stock": rng.randint(0, 500),
+        "rating": 0.0,
+        "ratingCount": 0,
+        "ratingSum": 0,
+        "totalSold": 0,
+        "createdAt": now - timedelta(days=rng.randint(0, 365)),
+        "updatedAt": now,
+    }
+
+def make_user(rng: random.Random, i: int, now: datetime):
+    return {
+        "_id": ObjectId(),
+        "name": f"User {i}",
+        "email": f"user{i}@example.com",
+        "location": rng.choice(["Lahore", "Karachi", "Islamabad", "Peshawar", "Quetta"]),
+        "totalSpent": 0.0,
+        "purchaseCount": 0,
+        "createdAt": now - timedelta(days=rng.randint(0, 365)),
+    }
+
+def make_order(rng: random.Random, user_id, catalog, items_per_order: int, now: datetime):
+    items = []
+    for index in rng.sample(range(len(catalog)), min(items_per_order, len(catalog))):
+        product_id, name, price = catalog[index]
+        items.append({"product": product_id, "name": name, "price": price,
+                      "quantity": rng.randint(1, 3)})
+    return {
+        "user": user_id,
+        "items": items,
+        "totalCost": round(sum(item["price"] * item["quantity"] for item in items), 2),
+        "status": rng.choice(STATUSES),
+        "createdAt": now - timedelta(days=rng.uniform(0, 60)),
+    }
+
+def _insert(collection, docs, batch_size: int):
+    for i in range(0, len(docs), batch_size):
+        collection.insert_many(docs[i:i + batch_size], ordered=False)
+
+# Fill db with a synthetic dataset scaled from seed.py's model.
+# Clears the collections first; ratings, popularity counters and indexes are rebuilt at the end.
+def generate(db, products: int = 10000, users: int = 2000, orders: int = 20000,
+             items_per_order: int = 3, reviews: int = 20000, seed: int = 42, batch_size: int = 5000):
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    for name in COLLECTIONS:
+        db[name].delete_many({})
+
+    catalog = []
+    batch = []
+    for i in range(products):
+        product = make_product(rng, i, now)
+        catalog.append((product["_id"], product["name"], product["price"]))
+        batch.append(product)
+        if len(batch) >= batch_size:
+            _insert(db['products'], batch, batch_size)
+            batch = []
+    _insert(db['products'], batch, batch_size)
+    print(f"[OK] Products inserted: {products}")
+
+    user_ids = []
+    batch = []
+    for i in range(users):
+        user = make_user(rng, i, now)
+        user_ids.append(user["_id"])
+        batch.append(user)
+        if len(batch) >= batch_size:
+            _insert(db['users'], batch, batch_size)
+            batch = []
+    _insert(db['users'], batch, batch_size)
+    print(f"[OK] Users inserted: {users}")
+
+    spent = {}
+    batch = []
+    for _ in range(orders):
+        order = make_order(rng, rng.choice(user_ids), catalog, items_per_order, now)
+        totals = spent.setdefault(order["user"], [0.0, 0])
+        totals[0] += order["totalCost"]
+        totals[1] += 1
+        batch.append(order)
+        if len(batch) >= batch_size:
+            _insert(db['orders'], batch, batch_size)
+            batch = []
+    _insert(db['orders'], batch, batch_size)
+    user_ops = [UpdateOne({"_id": user_id}, {"$set": {"totalSpent": round(total, 2), "purchaseCount": count}})
+                for user_id, (total, count) in spent.items()]
+    for i in range(0, len(user_ops), batch_size):
+        db['users'].bulk_write(user_ops[i:i + batch_size], ordered=False)
+    print(f"[OK] Orders inserted: {orders} ({items_per_order} items each)")
+
+    # Reviews skew towards a popular subset of the catalog, as real traffic does
+    ratings = {}
+    batch = []
+    for _ in range(reviews):
+        product_id = catalog[min(int(rng.paretovariate(1.2)) - 1, len(catalog) - 1)
+                             if rng.random() < 0.5 else rng.randrange(len(catalog))][0]
+        rating = rng.randint(1, 5)
+        totals = ratings.setdefault(product_id, [0, 0])
+        totals[0] += rating
+        totals[1] += 1
+        batch.append({"user": rng.choice(user_ids), "product": product_id, "rating": rating,
+                      "text": " ".join(rng.choices(WORDS, k=6)),
+                      "createdAt": now - timedelta(days=rng.uniform(0, 180))})
+        if len(batch) >= batch_size:
+            _insert(db['reviews'], batch, batch_size)
+            batch = []
+    _insert(db['reviews'], batch, batch_size)
+    rating_ops = [UpdateOne({"_id": product_id},
+                            {"$set": {"ratingSum": total, "ratingCount": count, "rating": total / count}})
+                  for product_id, (total, count) in ratings.items()]
+    for i in range(0, len(rating_ops), batch_size):
+        db['products'].bulk_write(rating_ops[i:i + batch_size], ordered=False)
+    print(f"[OK] Reviews inserted: {reviews}")
+
+    rebuild_popularity(db)
+    create_indexes(db)
+    print("[OK] Popularity counters and indexes built")
+
+    return {"products": products, "users": users, "orders": orders,
+            "items_per_order": items_per_order, "reviews": reviews, "seed": seed}
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument('--products', type=int, default=10000)
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--orders', type=int, default=20000)
+    parser.add_argument('--items', type=int, default=3, help="Items per order")
+    parser.add_argument('--reviews', type=int, default=20000)
+    parser.add_argument('--seed', type=int, default=42)
+
+def dataset_options(args) -> dict:
+    return {"products": args.products, "users": args.users, "orders": args.orders,
+            "items_per_order": args.items, "reviews": args.reviews, "seed": args.seed}
+
+# Generate a dataset into MONGO_URI / MONGO_DB_NAME (set MONGO_DB_NAME to keep it apart from real data)
+def run():
+    parser = argparse.ArgumentParser(description="Generate a synthetic Ecommerce dataset")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    from configure.db import connect_db, DB_NAME
+    if DB_NAME == "Ecommerce":
+        print("[ERROR] Refusing to overwrite the Ecommerce database; set MONGO_DB_NAME")
+        exit(1)
+    try:
+        generate(connect_db(), **dataset_options(args))
+    except Exception as err:
+        print(f"[ERROR] Generation error: {err}")
+        import traceback
+        traceback.print_exc()
+        exit(1)
+
+if __name__ == '__main__':
+    run()
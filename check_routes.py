@@ -1,7 +1,24 @@
-from main import app
+from fastapi.routing import APIRoute
+from main import create_app
 
-print("Registered Routes:")
-print("=" * 50)
-for route in app.routes:
-    if hasattr(route, 'methods') and hasattr(route, 'path'):
-        print(f"{list(route.methods)[0]:6} {route.path}")
+# Every API route as (methods, path). Newer FastAPI versions keep included routers nested
+# (their original router plus the include prefix) instead of copying routes into app.routes.
+def api_routes(routes, prefix: str = ""):
+    for route in routes:
+        if isinstance(route, APIRoute):
+            yield route.methods, prefix + route.path
+        elif hasattr(route, 'original_router'):
+            yield from api_routes(route.original_router.routes, prefix + route.include_context.prefix)
+
+def run():
+    # Building the app opens no database connection
+    app = create_app()
+
+    print("Registered Routes:")
+    print("=" * 50)
+    for methods, path in api_routes(app.routes):
+        # Starlette adds HEAD to every GET route; sets have no order, so sort for stable output
+        print(f"{','.join(sorted(methods - {'HEAD'})):6} {path}")
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,82 @@
+import contextvars
+from configure.settings import Settings, settings as env_settings
+from configure.db import Database
+from services.cache import create_cache, cache_ttls
+from services.search_index import create_search_engine
+from services.product_summaries import ProductSummaryCache
+from services.ranking import parse_weights
+
+# Everything an application builds from its Settings: database clients, response cache, product
+# summaries, the optional in-memory search engine and the tunables the controllers read.
+# create_app(settings) keeps one on app.state.context; the controllers reach it through
+# current_context(), which ContextMiddleware sets for every request of that app.
+class AppContext:
+    def __init__(self, settings: Settings):
+        self.settings = settings
+        self.db = Database(settings)
+        self.cache = create_cache(settings)
+        self.cache_ttls = cache_ttls(settings)
+        self.search_engine = create_search_engine(settings)
+        self.search_weights = parse_weights(settings.search_weights)
+        self.product_summaries = ProductSummaryCache(settings.product_summary_max_entries,
+                                                     settings.product_summary_ttl)
+        # Product invalidations (in this worker or, with a shared backend, any other) drop summaries
+        self.cache.subscribe(self.product_summaries.on_invalidation)
+
+    # Client (connects lazily), cache listener and search index loader; nothing waits for the database
+    async def start(self):
+        self.db.connect()
+        await self.cache.start()
+        if self.search_engine is not None:
+            await self.search_engine.start(self.db.get(read_only=True)['products'])
+
+    async def close(self):
+        if self.search_engine is not None:
+            await self.search_engine.close()
+        await self.cache.close()
+        await self.db.close()
+
+
+_current = contextvars.ContextVar('app_context', default=None)
+_default = None
+
+# Context of the running request; outside any app (scripts, benchmarks) one built from the environment
+def current_context() -> AppContext:
+    context = _current.get()
+    if context is not None:
+        return context
+    return default_context()
+
+def default_context() -> AppContext:
+    global _default
+    if _default is None:
+        _default = AppContext(env_settings)
+    return _default
+
+# Make context current in this task (and the tasks it creates); returns a token for reset_context
+def use_context(context: AppContext):
+    return _current.set(context)
+
+def reset_context(token):
+    _current.reset(token)
+
+class ContextMiddleware:
+    """Makes one application's context current for each of its requests"""
+
+    def __init__(self, app, context: AppContext):
+        self.app = app
+        self.context = context
+
+    async def __call__(self, scope, receive, send):
+        token = _current.set(self.context)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _current.reset(token)
+
+# Request-path database accessors of the current application
+def get_async_db(read_only: bool = False):
+    return current_context().db.get(read_only)
+
+def read_session():
+    return current_context().db.read_session()
@@ -1,24 +1,44 @@
-import os
-from pymongo import MongoClient
-from dotenv import load_dotenv
+import asyncio
+from pymongo import MongoClient, AsyncMongoClient
+from pymongo.read_preferences import read_pref_mode_from_name, make_read_preference
+from configure.settings import settings
+from services.metrics import command_timer
 
-load_dotenv()
+# Database name of the scripts (sync client); benchmarks point it at a separate database
+DB_NAME = settings.mongo_db_name
 
-# Global database connection
+# Global database connection (sync: scripts such as seed.py)
 client = None
 db = None
 
+# Pool and timeout settings, configurable through environment variables (configure/settings.py)
+def client_options(settings=settings):
+    return {
+        "maxPoolSize": settings.mongo_max_pool_size,
+        "minPoolSize": settings.mongo_min_pool_size,
+        "maxIdleTimeMS": settings.mongo_max_idle_time_ms,
+        "waitQueueTimeoutMS": settings.mongo_wait_queue_timeout_ms,
+        "serverSelectionTimeoutMS": settings.mongo_server_selection_timeout_ms,
+        "connectTimeoutMS": settings.mongo_connect_timeout_ms,
+        "socketTimeoutMS": settings.mongo_socket_timeout_ms,
+    }
+
+# Read preference used by read-only endpoints (e.g. secondaryPreferred, nearest, primary)
+def read_preference(settings=settings):
+    mode = read_pref_mode_from_name(settings.mongo_read_preference)
+    return make_read_preference(mode, None)
+
 # Function to connect to MongoDB
 def connect_db():
     global client, db
     try:
-        # Retrieve the Mongo URI from environment variables
-        uri = os.getenv('MONGO_URI')
-        
+        # Retrieve the Mongo URI from the settings (MONGO_URI)
+        uri = settings.mongo_uri
+
         # Connect to MongoDB
-        client = MongoClient(uri)
-        db = client["Ecommerce"]  # Database name set to Ecommerce
-        
+        client = MongoClient(uri, **client_options())
+        db = client[DB_NAME]  # Database name set to Ecommerce
+
         print('MongoDB connected to Ecommerce database')
         return db
     except Exception as err:
@@ -32,6 +52,55 @@ def get_db():
         connect_db()
     return db
 
+# Async clients of one application (request path: controllers reach them through
+# configure/context.py); each app built by create_app(settings) has its own
+class Database:
+    def __init__(self, settings):
+        self.settings = settings
+        self.name = settings.mongo_db_name
+        self.client = None
+        self.db = None
+        self.read_db = None
+
+    # The async client connects lazily on the first awaited operation;
+    # command_timer attributes each command's duration to the request that issued it
+    def connect(self):
+        self.client = AsyncMongoClient(self.settings.mongo_uri, event_listeners=[command_timer],
+                                       **client_options(self.settings))
+        self.db = self.client[self.name]
+        self.read_db = self.client.get_database(self.name, read_preference=read_preference(self.settings))
+        return self.db
+
+    # Read-only endpoints may be served by secondaries
+    def get(self, read_only: bool = False):
+        if self.db is None:
+            self.connect()
+        return self.read_db if read_only else self.db
+
+    # Warm the pool up to minPoolSize. The API runs this in the background after startup, so an
+    # unreachable server is reported instead of delaying (or failing) the start of the worker.
+    async def warm(self):
+        try:
+            # Concurrent pings each check out their own connection
+            warm = max(1, self.settings.mongo_min_pool_size)
+            await asyncio.gather(*(self.get().client.admin.command('ping') for _ in range(warm)))
+            print(f'MongoDB connected to {self.name} database ({warm} pooled connections warmed)')
+        except Exception as err:
+            print(f'[WARN] MongoDB connection error: {err}')
+
+    # Application shutdown: close every pooled connection
+    async def close(self):
+        if self.client is not None:
+            await self.client.close()
+        self.client = None
+        self.db = None
+        self.read_db = None
+
+    # Causally consistent session for read-only endpoints: a read issued after a version-marker read
+    # sees at least that version, even when the two reads are served by different secondaries
+    def read_session(self):
+        return self.get(read_only=True).client.start_session(causal_consistency=True)
+
 # Get collections
 def get_collections():
     database = get_db()
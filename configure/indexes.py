@@ -0,0 +1,101 @@
+from pymongo import IndexModel
+from services.popularity import SALES_COLLECTION
+
+# =============================
+# Index registry: every index a controller, script or write path relies on.
+# Names are explicit so existing indexes can be diffed against this list.
+# Secondary indexes are built after bulk loads so inserts do not pay for index maintenance.
+# =============================
+INDEXES = {
+    'products': [
+        # Text search (search_products_controller)
+        IndexModel([('name', 'text'), ('description', 'text'), ('brand', 'text')], name='products_text'),
+        # Natural key for idempotent catalog imports
+        IndexModel([('brand', 1), ('name', 1)], name='products_brand_name', unique=True),
+        # Search filters and sorts
+        IndexModel([('category', 1), ('price', 1)], name='products_category_price'),
+        IndexModel([('price', 1)], name='products_price'),
+        IndexModel([('totalSold', -1)], name='products_total_sold'),
+        # Delta sync of the in-memory search index (services/search_index.py)
+        IndexModel([('updatedAt', 1)], name='products_updated'),
+    ],
+    'users': [
+        IndexModel([('email', 1)], name='users_email', unique=True),
+    ],
+    'orders': [
+        # Keyset pagination of a user's orders
+        IndexModel([('user', 1), ('createdAt', -1), ('_id', -1)], name='orders_user_created'),
+        # Orders containing a product, per day (sales bucket recounts in services/read_models.py)
+        IndexModel([('items.product', 1), ('createdAt', 1)], name='orders_items_product_created'),
+        IndexModel([('createdAt', -1)], name='orders_created'),
+    ],
+    'reviews': [
+        # Keyset pagination of a product's reviews
+        IndexModel([('product', 1), ('createdAt', -1), ('_id', -1)], name='reviews_product_created'),
+    ],
+    SALES_COLLECTION: [
+        IndexModel([('product', 1), ('day', 1)], name='product_sales_product_day', unique=True),
+        IndexModel([('day', 1), ('category', 1)], name='product_sales_day_category'),
+    ],
+}
+
+# Indexes needed while bulk loading (upserts look records up by them)
+LOAD_INDEXES = {'products_brand_name', 'users_email'}
+
+def _selected(collections=None, names=None):
+    for collection, models in INDEXES.items():
+        if collections is not None and collection not in collections:
+            continue
+        chosen = [m for m in models if names is None or m.document['name'] in names]
+        if chosen:
+            yield collection, chosen
+
+# Create registered indexes (all by default); existing identical indexes are a no-op
+def create_indexes(db, collections=None, names=None):
+    for collection, models in _selected(collections, names):
+        db[collection].create_indexes(models)
+
+# Compare the registry with what exists: missing, unexpected and changed (same name, other keys)
+def diff_indexes(index_info: dict) -> dict:
+    """index_info maps collection -> collection.index_information()"""
+    diff = {"missing": [], "extra": [], "changed": []}
+    for collection, models in INDEXES.items():
+        existing = index_info.get(collection, {})
+        for model in models:
+            name = model.document['name']
+            if name not in existing:
+                diff["missing"].append((collection, name))
+                continue
+            expected = list(model.document['key'].items())
+            actual = [(field, direction) for field, direction in existing[name]['key']]
+            is_text = any(direction == 'text' for _, direction in expected)
+            if not is_text and expected != actual:
+                diff["changed"].append((collection, name))
+        declared = {model.document['name'] for model in models} | {'_id_'}
+        diff["extra"] += [(collection, name) for name in existing if name not in declared]
+    return diff
+
+def index_information(db) -> dict:
+    return {collection: db[collection].index_information() for collection in INDEXES}
+
+# Drop indexes that are not in the registry (never _id_)
+def drop_extra_indexes(db):
+    dropped = []
+    for collection, name in diff_indexes(index_information(db))["extra"]:
+        db[collection].drop_index(name)
+        dropped.append((collection, name))
+    return dropped
+
+# Startup check on the async client: warn (do not fail) when registered indexes are missing
+async def warn_missing_indexes(async_db):
+    try:
+        info = {collection: await async_db[collection].index_information() for collection in INDEXES}
+        diff = diff_indexes(info)
+        for collection, name in diff["missing"]:
+            print(f"[WARN] Missing index {collection}.{name}; run `python manage_indexes.py create`")
+        for collection, name in diff["changed"]:
+            print(f"[WARN] Index {collection}.{name} differs from the registry")
+        return diff
+    except Exception as err:
+        print(f"[WARN] Index check skipped: {err}")
+        return None
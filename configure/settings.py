@@ -0,0 +1,63 @@
+import os
+from dataclasses import dataclass, fields
+from typing import Optional
+from dotenv import load_dotenv
+
+# Every environment variable the application reads, in one place.
+# .env is loaded once, here; scripts and the API read Settings instead of os.getenv.
+@dataclass(frozen=True)
+class Settings:
+    # MongoDB
+    mongo_uri: Optional[str] = None
+    mongo_db_name: str = "Ecommerce"
+    mongo_max_pool_size: int = 100
+    mongo_min_pool_size: int = 10
+    mongo_max_idle_time_ms: int = 300000
+    mongo_wait_queue_timeout_ms: int = 5000
+    mongo_server_selection_timeout_ms: int = 5000
+    mongo_connect_timeout_ms: int = 5000
+    mongo_socket_timeout_ms: int = 30000
+    mongo_read_preference: str = "secondaryPreferred"
+
+    # Cache
+    cache_backend: str = "memory"
+    cache_max_entries: int = 1024
+    cache_file: str = "ecommerce-cache.sqlite3"
+    cache_file_max_entries: int = 10000
+    cache_url: str = "redis://localhost:6379/0"
+    cache_local_ttl: float = 5
+    cache_ttl_search: float = 30
+    cache_ttl_reviews: float = 60
+    cache_ttl_top_products: float = 300
+    product_summary_max_entries: int = 10000
+    product_summary_ttl: float = 300
+
+    # Search
+    search_engine: str = "mongo"
+    search_sync_seconds: float = 5
+    search_reload_seconds: float = 3600
+    search_weights: Optional[str] = None
+
+    # HTTP
+    slow_request_ms: float = 500
+    compression_min_size: int = 1024
+    compression_gzip_level: int = 6
+    compression_brotli_quality: int = 4
+
+    # Each field reads the upper-cased variable of the same name, e.g. MONGO_DB_NAME
+    @classmethod
+    def from_env(cls, environ=None) -> "Settings":
+        environ = os.environ if environ is None else environ
+        values = {}
+        for field in fields(cls):
+            raw = environ.get(field.name.upper())
+            if raw is None or raw == "":
+                continue
+            kind = float if field.type is float else int if field.type is int else str
+            values[field.name] = kind(raw)
+        return cls(**values)
+
+load_dotenv()
+
+# Process-wide settings; create_app(settings) in main.py accepts another instance
+settings = Settings.from_env()
@@ -1,58 +1,34 @@
-from datetime import datetime, timedelta
-from bson.objectid import ObjectId
+import asyncio
+from datetime import datetime
+from bson import ObjectId
+from bson.errors import InvalidId
 from fastapi import HTTPException
-from configure.db import get_db
-
-# Helper function to convert all ObjectIds in a document to strings
-def convert_objectids(doc):
-    """Recursively convert all ObjectId instances to strings in a document"""
-    if isinstance(doc, dict):
-        return {k: convert_objectids(v) for k, v in doc.items()}
-    elif isinstance(doc, list):
-        return [convert_objectids(item) for item in doc]
-    elif isinstance(doc, ObjectId):
-        return str(doc)
-    else:
-        return doc
+from pymongo import UpdateOne
+from configure.context import current_context, get_async_db, read_session
+from utils.ids import to_object_id
+from services.population import populate_orders
+from services.popularity import SALES_COLLECTION, WINDOW_DAYS, build_sales_updates, build_top_products_pipeline
+from services.read_models import TOP_PRODUCTS_COLLECTION, TOP_PRODUCTS_LIMIT, TOP_PRODUCTS_MAX_AGE
+from utils.projection import select_fields, projection
+from utils.etag import make_etag, etag_matches
+from models.order import PopulatedOrder
 
 # =============================
 # GET /orders/{order_id}
 # =============================
-def get_order_by_id_controller(order_id: str):
+async def get_order_by_id_controller(order_id: str, fields: str = None):
     try:
-        db = get_db()
+        db = get_async_db(read_only=True)
         orders_collection = db['orders']
-        users_collection = db['users']
-        products_collection = db['products']
+        selected = select_fields(PopulatedOrder, fields)
         
-        order = orders_collection.find_one({"_id": ObjectId(order_id)})
+        order = await orders_collection.find_one({"_id": to_object_id(order_id)}, projection(selected))
         if not order:
             raise HTTPException(status_code=404, detail="Order not found")
 
-        # populate user fields (name, email)
-        user_id = order.get('user')
-        if user_id:
-            user = users_collection.find_one({"_id": ObjectId(user_id) if not isinstance(user_id, ObjectId) else user_id}, {"name": 1, "email": 1})
-            if user:
-                order['user'] = user
-
-        # populate items.product fields (name, brand, price)
-        for item in order.get('items', []):
-            product_id = item.get('product')
-            if product_id:
-                # Convert to ObjectId if it's a string
-                if isinstance(product_id, str):
-                    product_id = ObjectId(product_id)
-                product = products_collection.find_one(
-                    {"_id": product_id}, 
-                    {"name": 1, "brand": 1, "price": 1}
-                )
-                if product:
-                    item['product'] = product
-
-        # Convert all ObjectIds to strings
-        order = convert_objectids(order)
-        
+        # populate user fields (name, email) and items.product fields (name, brand, price)
+        await populate_orders([order], populate_user=True)
+
         return order
     except HTTPException:
         raise
@@ -62,61 +38,277 @@ def get_order_by_id_controller(order_id: str):
 
 
 # =============================
-# GET /orders/top-products
-# Aggregation: Top 5 most frequently purchased products in last month, grouped by category
+# GET /orders/top-products?days=&limit=
+# Aggregation: Top N most frequently purchased products per category over the last `days` days,
+# merged from the daily product_sales rollup buckets
 # =============================
-def get_top_products_by_category_controller():
+async def load_top_products_by_category(days: int, limit: int, session=None):
+    db = get_async_db(read_only=True)
+    sales_collection = db[SALES_COLLECTION]
+
+    # Default window: one read of the lists the read-model worker keeps per category, served only
+    # while every category is fresh (a stopped worker makes them expire one by one)
+    if days == WINDOW_DAYS and limit <= TOP_PRODUCTS_LIMIT:
+        materialized = await db[TOP_PRODUCTS_COLLECTION].find(
+            {}, {"_id": 1, "topProducts": {"$slice": limit}, "refreshedAt": 1}, session=session
+        ).sort('_id', 1).to_list()
+        cutoff = datetime.utcnow() - TOP_PRODUCTS_MAX_AGE
+        if materialized and all(doc.get('refreshedAt') and doc['refreshedAt'] >= cutoff for doc in materialized):
+            return [{"_id": doc['_id'], "topProducts": doc['topProducts']} for doc in materialized]
+    
+    # Other windows (or no worker running): only the small bucket collection is read
+    pipeline = build_top_products_pipeline(days, limit)
+    return await (await sales_collection.aggregate(pipeline, session=session)).to_list()
+
+# Version marker of the materialized top sellers: latest refresh and number of categories.
+# None (no ETag) for other windows or when the endpoint falls back to the bucket aggregation.
+async def top_products_version(days: int, limit: int, session=None):
+    if days != WINDOW_DAYS or limit > TOP_PRODUCTS_LIMIT:
+        return None
+    db = get_async_db(read_only=True)
+    rollup = await (await db[TOP_PRODUCTS_COLLECTION].aggregate([
+        {"$group": {"_id": None, "refreshedAt": {"$max": "$refreshedAt"},
+                    "oldest": {"$min": "$refreshedAt"}, "categories": {"$sum": 1}}}
+    ], session=session)).to_list(1)
+    if not rollup or not rollup[0]['oldest'] or rollup[0]['oldest'] < datetime.utcnow() - TOP_PRODUCTS_MAX_AGE:
+        return None
+    return rollup[0]['refreshedAt'], rollup[0]['categories']
+
+# Returns (etag, categories), categories None when if_none_match is current
+async def get_top_products_by_category_controller(days: int = 30, limit: int = 5, if_none_match: str = None):
     try:
-        db = get_db()
-        orders_collection = db['orders']
-        
-        thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-        pipeline = [
-            {
-                "$match": {
-                    "createdAt": {"$gte": thirty_days_ago}
-                }
-            },
-            {"$unwind": "$items"},
-            {
-                "$group": {
-                    "_id": "$items.product",
-                    "totalSold": {"$sum": "$items.quantity"}
-                }
-            },
-            {
-                "$lookup": {
-                    "from": "products",
-                    "localField": "_id",
-                    "foreignField": "_id",
-                    "as": "product"
-                }
-            },
-            {"$unwind": "$product"},
-            {
-                "$group": {
-                    "_id": "$product.category",
-                    "topProducts": {
-                        "$push": {
-                            "name": "$product.name",
-                            "sold": "$totalSold"
-                        }
-                    }
-                }
-            },
-            {
-                "$project": {
-                    "topProducts": {"$slice": ["$topProducts", 5]}
-                }
-            }
-        ]
-
-        result = list(orders_collection.aggregate(pipeline))
-        
-        # Convert ObjectIds to strings
-        result = convert_objectids(result)
-        
-        return result
+        async with read_session() as session:
+            version = await top_products_version(days, limit, session)
+            etag = make_etag('top_products', days, limit, version) if version is not None else None
+            if etag_matches(if_none_match, etag):
+                return etag, None
+            context = current_context()
+            categories = await context.cache.get_or_load(
+                ('top_products', days, limit, version),
+                lambda: load_top_products_by_category(days, limit, session),
+                context.cache_ttls['top_products'],
+                tags=['top-products']
+            )
+        return etag, categories
     except Exception as err:
         print(f"Error in get_top_products_by_category_controller: {err}")
-        raise HTTPException(status_code=500, detail=str(err))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(err))
+
+
+# =============================
+# POST /orders and POST /orders/batch
+# Orders are priced from the catalog and stock is reserved with conditional decrements,
+# so it never goes negative under concurrent checkouts
+# =============================
+RESERVE_ATTEMPTS = 3
+# Product fields an order line copies or checks
+ORDER_PRODUCT_FIELDS = {"name": 1, "price": 1, "stock": 1, "category": 1}
+
+class StockConflict(Exception):
+    """A conditional stock decrement matched nothing: stock changed since it was read"""
+
+# Multi-document transactions need a replica set or mongos; checked once per process
+_transactions = None
+
+async def supports_transactions(db) -> bool:
+    global _transactions
+    if _transactions is None:
+        hello = await db.client.admin.command('hello')
+        _transactions = bool(hello.get('setName')) or hello.get('msg') == 'isdbgrid'
+    return _transactions
+
+# (user_id, {product_id: quantity}); repeated lines of one product are merged. Raises InvalidId.
+def parse_order(order_data):
+    quantities = {}
+    for line in order_data.items:
+        product_id = to_object_id(line.product)
+        quantities[product_id] = quantities.get(product_id, 0) + line.quantity
+    return to_object_id(order_data.user), quantities
+
+# Order document as stored: names and prices come from the catalog, never from the client
+def build_order(user_id, quantities, products, created_at: datetime):
+    items = [{"product": product_id, "name": products[product_id].get('name'),
+              "price": products[product_id].get('price', 0.0), "quantity": quantity}
+             for product_id, quantity in quantities.items()]
+    return {
+        "_id": ObjectId(),
+        "user": user_id,
+        "items": items,
+        "totalCost": round(sum(item["price"] * item["quantity"] for item in items), 2),
+        "status": 'placed',
+        "createdAt": created_at
+    }
+
+# Accept orders in request order while the stock read covers them
+def allocate(drafts, stock):
+    remaining = dict(stock)
+    accepted, short = [], {}
+    for index, order in drafts.items():
+        lacking = [item for item in order['items'] if remaining.get(item['product'], 0) < item['quantity']]
+        if lacking:
+            short[index] = (409, "Insufficient stock: " + ", ".join(str(item['name']) for item in lacking))
+            continue
+        for item in order['items']:
+            remaining[item['product']] -= item['quantity']
+        accepted.append(index)
+    return accepted, short
+
+async def load_stock(db, product_ids):
+    products = await db['products'].find({"_id": {"$in": list(product_ids)}}, {"stock": 1}).to_list()
+    return {product['_id']: product.get('stock', 0) for product in products}
+
+# Writes for a set of accepted orders, one operation per product / user / sales bucket.
+# sign=-1 builds the compensating writes.
+def build_order_writes(orders, products, sign: int = 1):
+    demand, spent = {}, {}
+    for order in orders:
+        for item in order['items']:
+            demand[item['product']] = demand.get(item['product'], 0) + item['quantity']
+        totals = spent.setdefault(order['user'], [0.0, 0])
+        totals[0] += order['totalCost']
+        totals[1] += 1
+
+    # Stock and totalSold move together in the one conditional update per product
+    reservations = [
+        ({"_id": product_id, "stock": {"$gte": quantity}} if sign > 0 else {"_id": product_id},
+         {"$inc": {"stock": -quantity * sign, "totalSold": quantity * sign}, "$currentDate": {"updatedAt": True}})
+        for product_id, quantity in demand.items()
+    ]
+    user_ops = [
+        UpdateOne({"_id": user_id}, {"$inc": {"totalSpent": round(total, 2) * sign, "purchaseCount": count * sign}})
+        for user_id, (total, count) in spent.items()
+    ]
+    # All orders share one createdAt, so their items fall into the same daily buckets
+    _, bucket_ops = build_sales_updates({"createdAt": orders[0]['createdAt'],
+                                         "items": [{"product": product_id, "quantity": quantity * sign}
+                                                   for product_id, quantity in demand.items()]}, products)
+    return reservations, user_ops, bucket_ops
+
+# Replica set / mongos: reservation, orders and counters commit or abort together
+async def commit_in_transaction(db, orders, products):
+    reservations, user_ops, bucket_ops = build_order_writes(orders, products)
+
+    async def write(session):
+        result = await db['products'].bulk_write([UpdateOne(*op) for op in reservations],
+                                                 ordered=False, session=session)
+        if result.matched_count != len(reservations):
+            raise StockConflict()
+        await db['orders'].insert_many(orders, ordered=False, session=session)
+        await db['users'].bulk_write(user_ops, ordered=False, session=session)
+        await db[SALES_COLLECTION].bulk_write(bucket_ops, ordered=False, session=session)
+
+    async with db.client.start_session() as session:
+        await session.with_transaction(write)
+
+# Standalone mongod: each reservation's outcome is needed to undo the others, so they run as
+# concurrent single updates. Counters are written before the orders, so the read-model worker
+# (which recomputes them from the orders) always converges, and everything is undone on failure.
+async def commit_with_compensation(db, orders, products):
+    reservations, user_ops, bucket_ops = build_order_writes(orders, products)
+    undo_reservations, undo_users, undo_buckets = build_order_writes(orders, products, sign=-1)
+    products_collection = db['products']
+
+    results = await asyncio.gather(*(products_collection.update_one(query, update)
+                                     for query, update in reservations))
+    if not all(result.matched_count for result in results):
+        await asyncio.gather(*(products_collection.update_one(*undo)
+                               for undo, result in zip(undo_reservations, results) if result.matched_count))
+        raise StockConflict()
+
+    try:
+        await asyncio.gather(
+            db['users'].bulk_write(user_ops, ordered=False),
+            db[SALES_COLLECTION].bulk_write(bucket_ops, ordered=False)
+        )
+        await db['orders'].insert_many(orders, ordered=False)
+    except Exception:
+        await asyncio.gather(
+            db['orders'].delete_many({"_id": {"$in": [order['_id'] for order in orders]}}),
+            db['users'].bulk_write(undo_users, ordered=False),
+            db[SALES_COLLECTION].bulk_write(undo_buckets, ordered=False),
+            products_collection.bulk_write([UpdateOne(*undo) for undo in undo_reservations], ordered=False)
+        )
+        raise
+
+# Place many orders: two reads for every user and product, one reservation write per product.
+# Returns (placed, rejected): placed maps request index -> order, rejected index -> (status, detail)
+async def place_orders(orders_data):
+    db = get_async_db()
+    now = datetime.utcnow()
+
+    parsed, rejected = {}, {}
+    for index, order_data in enumerate(orders_data):
+        try:
+            parsed[index] = parse_order(order_data)
+        except InvalidId:
+            rejected[index] = (400, "Invalid user or product id")
+
+    user_ids = {user_id for user_id, _ in parsed.values()}
+    product_ids = {product_id for _, quantities in parsed.values() for product_id in quantities}
+    known_users, found = await asyncio.gather(
+        db['users'].distinct('_id', {"_id": {"$in": list(user_ids)}}),
+        db['products'].find({"_id": {"$in": list(product_ids)}}, ORDER_PRODUCT_FIELDS).to_list()
+    )
+    known_users = set(known_users)
+    products = {product['_id']: product for product in found}
+
+    drafts = {}
+    for index, (user_id, quantities) in parsed.items():
+        missing = [str(product_id) for product_id in quantities if product_id not in products]
+        if user_id not in known_users:
+            rejected[index] = (404, "User not found")
+        elif missing:
+            rejected[index] = (404, f"Product not found: {', '.join(missing)}")
+        else:
+            drafts[index] = build_order(user_id, quantities, products, now)
+
+    # Stock may change between the read and the reservation; re-read and re-allocate on conflict
+    commit = commit_in_transaction if await supports_transactions(db) else commit_with_compensation
+    stock = {product_id: product.get('stock', 0) for product_id, product in products.items()}
+    for attempt in range(1, RESERVE_ATTEMPTS + 1):
+        accepted, short = allocate(drafts, stock)
+        try:
+            if accepted:
+                await commit(db, [drafts[index] for index in accepted], products)
+            break
+        except StockConflict:
+            if attempt == RESERVE_ATTEMPTS:
+                raise HTTPException(status_code=409, detail="Stock changed during checkout, retry the order")
+            stock = await load_stock(db, product_ids)
+
+    # The new sales change every top-products window cached from the buckets
+    if accepted:
+        await current_context().cache.invalidate_tags('top-products')
+
+    rejected.update(short)
+    return {index: drafts[index] for index in accepted}, rejected
+
+def order_created(order):
+    return {key: order[key] for key in ('_id', 'totalCost', 'status', 'createdAt')}
+
+async def create_order_controller(order_data):
+    try:
+        placed, rejected = await place_orders([order_data])
+        if rejected:
+            status_code, detail = rejected[0]
+            raise HTTPException(status_code=status_code, detail=detail)
+        return order_created(placed[0])
+    except HTTPException:
+        raise
+    except Exception as err:
+        print(f"Error in create_order_controller: {err}")
+        raise HTTPException(status_code=500, detail=str(err))
+
+# Batch checkout: orders are accepted or rejected one by one, written together
+async def create_orders_batch_controller(orders_data):
+    try:
+        placed, rejected = await place_orders(orders_data)
+        return {
+            "placed": [{"index": index, **order_created(order)} for index, order in sorted(placed.items())],
+            "rejected": [{"index": index, "detail": detail} for index, (_, detail) in sorted(rejected.items())]
+        }
+    except HTTPException:
+        raise
+    except Exception as err:
+        print(f"Error in create_orders_batch_controller: {err}")
+        raise HTTPException(status_code=500, detail=str(err))
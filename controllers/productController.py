@@ -1,156 +1,310 @@
-from bson import ObjectId
 from datetime import datetime
 from fastapi import HTTPException
-from configure.db import get_db
-
-# Helper function to convert all ObjectIds in a document to strings
-def convert_objectids(doc):
-    """Recursively convert all ObjectId instances to strings in a document"""
-    if isinstance(doc, dict):
-        return {k: convert_objectids(v) for k, v in doc.items()}
-    elif isinstance(doc, list):
-        return [convert_objectids(item) for item in doc]
-    elif isinstance(doc, ObjectId):
-        return str(doc)
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from configure.context import current_context, get_async_db, read_session
+from utils.ids import to_object_id
+from services.cache import product_tag, reviews_tag
+from services.ranking import RankWeights, DEFAULT_WEIGHTS, parse_weights
+from services.facets import build_facet_branches, pipeline_counts, format_facets
+from utils.pagination import cursor_query, keyset_filter, decode_cursor, paginate
+from utils.projection import model_fields, select_fields, projection, trim
+from utils.etag import make_etag, etag_matches
+from models.product import ProductInDB, ProductSearchResult
+from models.review import ReviewResult
+
+# Stored product fields; search results add the computed scores on top
+PRODUCT_FIELDS = model_fields(ProductInDB)
+
+# Sort keys for the search pipeline; `_id` keeps ties stable between pages
+SEARCH_SORTS = {
+    'price_asc': [("price", 1), ("_id", 1)],
+    'price_desc': [("price", -1), ("_id", 1)],
+    'popularity': [("popularity", -1), ("_id", 1)],
+    'relevance': [("finalScore", -1), ("_id", 1)],
+}
+
+# Newest first; _id breaks ties between reviews created in the same instant
+REVIEW_SORT = [("createdAt", -1), ("_id", -1)]
+
+# Build the search aggregation: filter, popularity, scoring, sorting and paging all run in MongoDB
+def build_search_pipeline(query: str, min_price: float, max_price: float,
+                          category: str, skip: int, limit: int, sort: str, budget: float,
+                          cursor: str = None, fields: list = None,
+                          weights: RankWeights = DEFAULT_WEIGHTS, facets: bool = False):
+    fields = fields or model_fields(ProductSearchResult)
+    sort_fields = SEARCH_SORTS.get(sort, SEARCH_SORTS['relevance'])
+
+    # 1) text search plus price/category predicates in a single $match
+    text = {"$text": {"$search": query}} if query else {}
+    price = {}
+    if min_price is not None:
+        price["$gte"] = min_price
+    if max_price is not None:
+        price["$lte"] = max_price
+    price_match = {"price": price} if price else {}
+    category_match = {"category": category} if category is not None else {}
+    filters = {**price_match, **category_match}
+
+    # Carry only the returned stored fields plus the scoring (and facet) inputs through the pipeline
+    extra = ("category", "brand", "rating") if facets else ()
+    stored = projection([name for name in fields if name in PRODUCT_FIELDS], "price", "totalSold", *extra)
+    if query:
+        stored["score"] = {"$meta": "textScore"}
+
+    # 2) popularity: precomputed units sold, maintained by services/popularity.py
+    ranked = [
+        {"$addFields": {"popularity": {"$ifNull": ["$totalSold", 0]}}},
+        {"$setWindowFields": {"output": {"_maxPop": {"$max": "$popularity"}}}},
+    ]
+
+    # 3) finalScore = weighted similarity + popularity + price closeness (default 0.4/0.4/0.2)
+    sim = {"$divide": ["$score", 10]} if query else 0.5
+    pop_score = {"$cond": [{"$gt": ["$_maxPop", 0]}, {"$divide": ["$popularity", "$_maxPop"]}, 0]}
+    if budget:
+        price_score = {"$subtract": [1, {"$divide": [
+            {"$abs": {"$subtract": ["$price", budget]}}, max(budget, 1)
+        ]}]}
     else:
-        return doc
+        price_score = 1
+    ranked += [
+        {"$addFields": {"simScore": sim}},
+        {"$addFields": {"finalScore": {"$add": [
+            {"$multiply": [weights.similarity, "$simScore"]},
+            {"$multiply": [weights.popularity, pop_score]},
+            {"$multiply": [weights.price, price_score]}
+        ]}}},
+        {"$project": {"_maxPop": 0}},
+    ]
 
-# Search products controller
-def search_products_controller(query: str, min_price: float, max_price: float, 
-                               category: str, page: int, limit: int, sort: str, budget: float):
-    try:
-        db = get_db()
+    # 4) total and requested page in one round trip; $sort + $limit keeps only the top of the page.
+    # With a cursor the page starts after the cursor's sort key instead of skipping `skip` documents.
+    results = []
+    if cursor:
+        results.append({"$match": keyset_filter(sort_fields, decode_cursor(cursor, sort_fields))})
+    results.append({"$sort": dict(sort_fields)})
+    if not cursor and skip:
+        results.append({"$skip": skip})
+    results.append({"$limit": limit + 1})
+    results.append({"$project": projection(fields, *[name for name, _ in sort_fields])})
+
+    if not facets:
+        return [{"$match": {**text, **filters}}, {"$project": stored}] + ranked + [{"$facet": {
+            "total": [{"$count": "count"}],
+            "results": results
+        }}]
+
+    # 5) facets: the text match is shared, each branch applies the filters its counts respect
+    where = [{"$match": filters}] if filters else []
+    return [{"$match": text}, {"$project": stored}, {"$facet": {
+        "total": where + [{"$count": "count"}],
+        "results": where + ranked + results,
+        **build_facet_branches(filters, price_match, category_match)
+    }}]
+
+# Run the search pipeline for one page
+async def load_search_page(query: str, min_price: float, max_price: float,
+                           category: str, page: int, limit: int, sort: str, budget: float,
+                           cursor: str = None, fields: list = None,
+                           weights: RankWeights = DEFAULT_WEIGHTS, facets: bool = False):
+    skip = (page - 1) * limit
+    sort_fields = SEARCH_SORTS.get(sort, SEARCH_SORTS['relevance'])
+
+    search_engine = current_context().search_engine
+    if search_engine is not None and search_engine.ready:
+        # In-process index (SEARCH_ENGINE=memory): BM25 + prefix match, no database round trip
+        after = decode_cursor(cursor, sort_fields) if cursor else None
+        total, results, counts = search_engine.search(query, min_price, max_price, category, skip, limit,
+                                                      sort_fields, budget, after,
+                                                      fields or model_fields(ProductSearchResult), weights,
+                                                      facets)
+    else:
+        db = get_async_db(read_only=True)
         products_collection = db['products']
-        orders_collection = db['orders']
-        
-        skip = (page - 1) * limit
-
-        # 1) Try text search
-        if query:
-            results = list(products_collection.find(
-                {"$text": {"$search": query}}, 
-                {"score": {"$meta": "textScore"}}
-            ).sort([("score", {"$meta": "textScore"})]).limit(200))
-        else:
-            # if no query, return recent products
-            results = list(products_collection.find().sort([("createdAt", -1)]).limit(200))
-
-        # 2) apply filters
-        filtered = [p for p in results if (
-            (min_price is None or p['price'] >= min_price) and
-            (max_price is None or p['price'] <= max_price) and
-            (category is None or p['category'] == category)
-        )]
-
-        # Get product IDs for popularity calculation
-        prod_ids = [p['_id'] for p in filtered]
-        
-        # Convert to both formats to handle different storage types
-        prod_ids_obj = [pid if isinstance(pid, ObjectId) else ObjectId(pid) for pid in prod_ids if pid]
-        prod_ids_str = [str(pid) for pid in prod_ids]
-
-        pop_map = {}
-        if prod_ids_obj:
-            # Try matching with ObjectId
-            pop_agg = orders_collection.aggregate([
-                {"$match": {"items.product": {"$in": prod_ids_obj}}},
-                {"$unwind": "$items"},
-                {"$match": {"items.product": {"$in": prod_ids_obj}}},
-                {"$group": {"_id": "$items.product", "totalSold": {"$sum": "$items.quantity"}}}
-            ])
-            for item in pop_agg:
-                pop_map[str(item['_id'])] = item['totalSold']
-            
-            # Also try matching with string format
-            pop_agg_str = orders_collection.aggregate([
-                {"$match": {"items.product": {"$in": prod_ids_str}}},
-                {"$unwind": "$items"},
-                {"$match": {"items.product": {"$in": prod_ids_str}}},
-                {"$group": {"_id": "$items.product", "totalSold": {"$sum": "$items.quantity"}}}
-            ])
-            for item in pop_agg_str:
-                pop_map[str(item['_id'])] = item.get('totalSold', 0) + pop_map.get(str(item['_id']), 0)
-
-        max_pop = max([0] + list(pop_map.values()))
-
-        # 4) attach metadata and compute a final score
-        enriched = []
-        for p in filtered:
-            # Convert all ObjectIds to strings
-            p = convert_objectids(p)
-            pop = pop_map.get(p['_id'], 0)
-            sim = p.get('score', 0) / 10 if p.get('score') else 0.5
-            pop_score = pop / max_pop if max_pop else 0
-            price_score = 1 - abs(p['price'] - budget) / max(budget, 1) if budget else 1
-            final_score = 0.4 * sim + 0.4 * pop_score + 0.2 * price_score
-            enriched.append({**p, "popularity": pop, "simScore": sim, "finalScore": final_score})
-
-        # 5) sort results
-        if sort == 'price_asc':
-            enriched.sort(key=lambda x: x['price'])
-        elif sort == 'price_desc':
-            enriched.sort(key=lambda x: x['price'], reverse=True)
-        elif sort == 'popularity':
-            enriched.sort(key=lambda x: x['popularity'], reverse=True)
-        else:
-            enriched.sort(key=lambda x: x.get('finalScore', 0), reverse=True)
-
-        paged = enriched[skip:skip + limit]
+        pipeline = build_search_pipeline(query, min_price, max_price, category,
+                                         skip, limit, sort, budget, cursor, fields, weights, facets)
+        output = await (await products_collection.aggregate(pipeline)).to_list(1)
+        output = output[0] if output else {"total": [], "results": []}
+        total = output["total"][0]["count"] if output["total"] else 0
+        results = output["results"]
+        counts = pipeline_counts(output) if facets else None
+    results, next_cursor = paginate(results, limit, sort_fields)
+    if fields:
+        trim(results, fields)
 
-        return {
-            "page": page,
-            "limit": limit,
-            "total": len(enriched),
-            "results": paged
-        }
+    page_data = {
+        "page": page,
+        "limit": limit,
+        "total": total,
+        "next_cursor": next_cursor,
+        "results": results
+    }
+    if facets:
+        page_data["facets"] = format_facets(counts)
+    return page_data
+
+# Search products controller
+async def search_products_controller(query: str, min_price: float, max_price: float, 
+                               category: str, page: int, limit: int, sort: str, budget: float,
+                               cursor: str = None, fields: str = None, weights: str = None,
+                               facets: bool = False):
+    try:
+        selected = select_fields(ProductSearchResult, fields) if fields else None
+        context = current_context()
+        rank_weights = parse_weights(weights, context.search_weights)
+        args = (query, min_price, max_price, category, page, limit, sort, budget, cursor)
+        # Pages are tagged with every product they contain so product writes evict them
+        return await context.cache.get_or_load(
+            ('search',) + args + (fields, rank_weights, facets),
+            lambda: load_search_page(*args, fields=selected, weights=rank_weights, facets=facets),
+            context.cache_ttls['search'],
+            tags=lambda result: [product_tag(p['_id']) for p in result['results']]
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         print(e)
         raise HTTPException(status_code=500, detail=str(e))
 
-# Get product reviews controller
-def get_product_reviews_controller(product_id: str):
+# Load one page of a product's reviews
+async def load_reviews_page(product_id: str, limit: int, cursor: str = None, fields: list = None,
+                            session=None):
+    db = get_async_db(read_only=True)
+    reviews_collection = db['reviews']
+    fields = fields or model_fields(ReviewResult)
+    
+    # One page of reviews, keyset-paginated on (createdAt, _id)
+    query = cursor_query({"product": to_object_id(product_id)}, cursor, REVIEW_SORT)
+    reviews = await reviews_collection.find(query, projection(fields, "createdAt"), session=session) \
+        .sort(REVIEW_SORT).limit(limit + 1).to_list()
+    reviews, next_cursor = paginate(reviews, limit, REVIEW_SORT)
+    trim(reviews, fields)
+    
+    return {
+        "limit": limit,
+        "next_cursor": next_cursor,
+        "results": reviews
+    }
+
+# Version marker of a product's reviews: ratingCount grows with every review (None: no such product)
+async def reviews_version(product_id: str, session=None):
+    db = get_async_db(read_only=True)
+    product = await db['products'].find_one({"_id": to_object_id(product_id)}, {"ratingCount": 1},
+                                            session=session)
+    return product.get('ratingCount', 0) if product else None
+
+# Get product reviews controller; returns (etag, page), page None when if_none_match is current
+async def get_product_reviews_controller(product_id: str, limit: int = 20, cursor: str = None,
+                                         fields: str = None, if_none_match: str = None):
     try:
-        db = get_db()
-        reviews_collection = db['reviews']
-        
-        reviews = list(reviews_collection.find({"product": ObjectId(product_id)})
-                       .sort([("createdAt", -1)]))
-        
-        # Convert all ObjectIds to strings recursively
-        reviews = convert_objectids(reviews)
-        
-        return reviews
+        selected = select_fields(ReviewResult, fields)
+        async with read_session() as session:
+            version = await reviews_version(product_id, session)
+            etag = make_etag('reviews', product_id, limit, cursor, fields, version) if version is not None else None
+            if etag_matches(if_none_match, etag):
+                return etag, None
+            # Keyed by version too, so a cached page is never newer-tagged than its content
+            context = current_context()
+            page = await context.cache.get_or_load(
+                ('reviews', product_id, limit, cursor, fields, version),
+                lambda: load_reviews_page(product_id, limit, cursor, selected, session),
+                context.cache_ttls['reviews'],
+                tags=[reviews_tag(product_id)]
+            )
+        return etag, page
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# Atomic rating update: one update-pipeline adds `count` ratings summing to `total` and
+# derives the mean server-side, so concurrent reviews never overwrite each other
+def build_rating_update(count: int, total: int):
+    # Products written before ratingSum existed start from rating * ratingCount
+    current_sum = {"$ifNull": ["$ratingSum", {"$multiply": [
+        {"$ifNull": ["$rating", 0]}, {"$ifNull": ["$ratingCount", 0]}
+    ]}]}
+    return [
+        {"$set": {
+            "ratingSum": {"$add": [current_sum, total]},
+            "ratingCount": {"$add": [{"$ifNull": ["$ratingCount", 0]}, count]}
+        }},
+        {"$set": {"rating": {"$divide": ["$ratingSum", "$ratingCount"]}, "updatedAt": "$$NOW"}}
+    ]
+
+# Review document as stored in MongoDB
+def build_review(product_id, review_data, created_at: datetime):
+    return {
+        "user": to_object_id(review_data.user),
+        "product": product_id,
+        "rating": review_data.rating,
+        "text": review_data.text,
+        "createdAt": created_at
+    }
+
 # Post product review controller
-def post_product_review_controller(product_id: str, review_data):
+async def post_product_review_controller(product_id: str, review_data):
     try:
-        db = get_db()
+        db = get_async_db()
         products_collection = db['products']
         reviews_collection = db['reviews']
         
-        review = {
-            "user": review_data.user,
-            "product": ObjectId(product_id),
-            "rating": review_data.rating,
-            "text": review_data.text,
-            "createdAt": datetime.utcnow()
-        }
-        result = reviews_collection.insert_one(review)
-
-        # Update the product's rating
-        product = products_collection.find_one({"_id": ObjectId(product_id)})
-        if product:
-            new_count = (product.get('ratingCount', 0)) + 1
-            old_rating = product.get('rating', 0)
-            old_count = product.get('ratingCount', 0)
-            new_rating = ((old_rating * old_count) + review_data.rating) / new_count
-            products_collection.update_one(
-                {"_id": ObjectId(product_id)}, 
-                {"$set": {"rating": new_rating, "ratingCount": new_count}}
-            )
+        product_id = to_object_id(product_id)
+        review = build_review(product_id, review_data, datetime.utcnow())
+
+        # Insert the review, then update the product's rating: ratingCount is the reviews' ETag
+        # version marker, so it must never be visible before the review it counts
+        result = await reviews_collection.insert_one(review)
+        await products_collection.update_one({"_id": product_id}, build_rating_update(1, review_data.rating))
+
+        # Drop cached review pages and any search page showing this product's rating
+        await current_context().cache.invalidate_tags(reviews_tag(product_id), product_tag(product_id))
 
         return {"_id": str(result.inserted_id), "message": "Review added successfully"}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+
+# Bulk review ingest controller: many reviews, one insert and one rating write per product.
+# Reviews that fail to insert are reported by index; the ones that were stored still count
+# towards their product's rating, so a partial failure never leaves ratings behind.
+async def post_product_reviews_bulk_controller(reviews_data):
+    try:
+        db = get_async_db()
+        products_collection = db['products']
+        reviews_collection = db['reviews']
+
+        now = datetime.utcnow()
+        reviews = [build_review(to_object_id(review_data.product), review_data, now)
+                   for review_data in reviews_data]
+
+        # Reviews first, ratings (the ETag version markers) second
+        rejected = {}
+        try:
+            await reviews_collection.insert_many(reviews, ordered=False)
+        except BulkWriteError as err:
+            rejected = {error['index']: error.get('errmsg', 'Insert failed')
+                        for error in err.details.get('writeErrors', [])}
+
+        ratings = {}  # product_id -> [count, total], inserted reviews only
+        for index, review in enumerate(reviews):
+            if index in rejected:
+                continue
+            count_total = ratings.setdefault(review['product'], [0, 0])
+            count_total[0] += 1
+            count_total[1] += review['rating']
+
+        if ratings:
+            await products_collection.bulk_write([
+                UpdateOne({"_id": product_id}, build_rating_update(count, total))
+                for product_id, (count, total) in ratings.items()
+            ], ordered=False)
+            tags = [tag for product_id in ratings for tag in (reviews_tag(product_id), product_tag(product_id))]
+            await current_context().cache.invalidate_tags(*tags)
+
+        return {
+            "inserted": len(reviews) - len(rejected),
+            "products": len(ratings),
+            "rejected": [{"index": index, "detail": detail} for index, detail in sorted(rejected.items())]
+        }
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
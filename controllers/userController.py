@@ -1,47 +1,54 @@
-from bson import ObjectId
 from fastapi import HTTPException
-from configure.db import get_db
+from configure.context import get_async_db, read_session
+from utils.ids import to_object_id
+from services.population import populate_orders
+from utils.pagination import cursor_query, paginate
+from utils.projection import select_fields, projection, trim
+from utils.etag import make_etag, etag_matches
+from models.order import PopulatedOrder
 
-# Helper function to convert all ObjectIds in a document to strings
-def convert_objectids(doc):
-    """Recursively convert all ObjectId instances to strings in a document"""
-    if isinstance(doc, dict):
-        return {k: convert_objectids(v) for k, v in doc.items()}
-    elif isinstance(doc, list):
-        return [convert_objectids(item) for item in doc]
-    elif isinstance(doc, ObjectId):
-        return str(doc)
-    else:
-        return doc
+# Newest first; _id breaks ties between orders created in the same instant
+ORDER_SORT = [('createdAt', -1), ('_id', -1)]
 
-# GET /users/{user_id}/orders
-def get_user_orders_controller(user_id: str):
+# Version marker of a user's orders: the newest one (orders are only ever added)
+async def user_orders_version(user_id, session=None):
+    db = get_async_db(read_only=True)
+    latest = await db['orders'].find_one({'user': user_id}, {'createdAt': 1}, sort=ORDER_SORT, session=session)
+    return (latest['createdAt'], latest['_id']) if latest else None
+
+# GET /users/{user_id}/orders; returns (etag, page), page None when if_none_match is current
+async def get_user_orders_controller(user_id: str, limit: int = 20, cursor: str = None,
+                                     fields: str = None, if_none_match: str = None):
     try:
-        db = get_db()
+        db = get_async_db(read_only=True)
         orders_collection = db['orders']
-        products_collection = db['products']
-        
-        # Find all orders for the user
-        orders = list(orders_collection.find({'user': ObjectId(user_id)}).sort([('createdAt', -1)]))
+        selected = select_fields(PopulatedOrder, fields)
+        user_id = to_object_id(user_id)
         
-        # Populate product details for each order
-        for order in orders:
-            if 'items' in order:
-                for item in order['items']:
-                    if 'product' in item:
-                        # Get product details
-                        product_id = item['product'] if isinstance(item['product'], ObjectId) else ObjectId(item['product'])
-                        product = products_collection.find_one(
-                            {'_id': product_id},
-                            {'name': 1, 'brand': 1, 'price': 1}
-                        )
-                        if product:
-                            item['product'] = convert_objectids(product)
+        async with read_session() as session:
+            # One indexed read decides whether the page (and its population) is needed at all
+            etag = make_etag('user_orders', user_id, limit, cursor, fields,
+                             await user_orders_version(user_id, session))
+            if etag_matches(if_none_match, etag):
+                return etag, None
+
+            # Find one page of the user's orders (keyset on createdAt, _id)
+            query = cursor_query({'user': user_id}, cursor, ORDER_SORT)
+            orders = await orders_collection.find(query, projection(selected, 'createdAt'), session=session) \
+                .sort(ORDER_SORT).limit(limit + 1).to_list()
+        orders, next_cursor = paginate(orders, limit, ORDER_SORT)
+        trim(orders, selected)
         
-        # Convert all ObjectIds to strings
-        orders = convert_objectids(orders)
+        # Populate product details for all orders with a single $in query
+        await populate_orders(orders)
         
-        return orders
+        return etag, {
+            "limit": limit,
+            "next_cursor": next_cursor,
+            "results": orders
+        }
+    except HTTPException:
+        raise
     except Exception as err:
         print(f"Error in get_user_orders_controller: {err}")
         raise HTTPException(status_code=500, detail=str(err))
\ No newline at end of file
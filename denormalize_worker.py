@@ -0,0 +1,36 @@
+import argparse
+from configure.db import connect_db
+from configure.indexes import create_indexes
+from services.popularity import SALES_COLLECTION
+from services.read_models import reconcile_all, run_worker
+
+# Keep users' totals, product ratings/totalSold, sales buckets and the per-category
+# top sellers in step with new orders and reviews (change streams, or polling on standalone)
+def run():
+    parser = argparse.ArgumentParser(description="Denormalized read-model worker")
+    parser.add_argument('--poll', action='store_true', help="Poll by _id instead of tailing change streams")
+    parser.add_argument('--batch-size', type=int, default=500, help="Events applied per refresh")
+    parser.add_argument('--interval', type=float, default=2.0, help="Seconds between polls when idle")
+    parser.add_argument('--reconcile', action='store_true', help="Recompute every read model before tailing")
+    args = parser.parse_args()
+
+    try:
+        db = connect_db()
+        create_indexes(db, collections=['orders', 'reviews', SALES_COLLECTION])
+        print("[OK] Indexes ensured on orders, reviews and product_sales")
+
+        if args.reconcile:
+            result = reconcile_all(db)
+            print(f"[OK] Reconciled {result['users']} users and {result['products']} products")
+
+        run_worker(db, args.batch_size, args.interval, force_poll=args.poll)
+    except KeyboardInterrupt:
+        print("[..] Worker stopped")
+    except Exception as err:
+        print(f"[ERROR] Worker error: {err}")
+        import traceback
+        traceback.print_exc()
+        exit(1)
+
+if __name__ == '__main__':
+    run()
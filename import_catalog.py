@@ -0,0 +1,39 @@
+import argparse
+from configure.db import connect_db
+from configure.indexes import create_indexes
+from services.importer import import_file, create_natural_key_indexes, NATURAL_KEYS
+
+# Stream a JSON array or NDJSON file into products/users with idempotent, resumable bulk upserts
+def run():
+    parser = argparse.ArgumentParser(description="Import catalog data (JSON array or NDJSON)")
+    parser.add_argument('collection', choices=sorted(NATURAL_KEYS))
+    parser.add_argument('path')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--no-resume', action='store_true', help="Ignore the saved checkpoint")
+    parser.add_argument('--skip-indexes', action='store_true', help="Do not build secondary indexes")
+    args = parser.parse_args()
+
+    try:
+        db = connect_db()
+
+        create_natural_key_indexes(db)
+        import_file(db, args.collection, args.path, batch_size=args.batch_size,
+                    workers=args.workers, resume=not args.no_resume)
+
+        if not args.skip_indexes:
+            create_indexes(db)
+            print("[OK] Secondary indexes built")
+
+        print("\n[SUCCESS] Import complete")
+    except FileNotFoundError as e:
+        print(f"[ERROR] Import error: Data file not found - {e}")
+        exit(1)
+    except Exception as err:
+        print(f"[ERROR] Import error: {err}")
+        import traceback
+        traceback.print_exc()
+        exit(1)
+
+if __name__ == '__main__':
+    run()
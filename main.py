@@ -1,38 +1,97 @@
 # main.py
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from dotenv import load_dotenv
-from configure.db import connect_db
+from fastapi.responses import PlainTextResponse
+from configure.settings import Settings
+from configure.context import AppContext, ContextMiddleware, default_context, use_context, reset_context
+from configure.indexes import warn_missing_indexes
+from services.metrics import MetricsMiddleware, render_metrics
+from utils.compression import CompressionMiddleware
+from utils.serializer import MongoJSONResponse
 from routes.productRoutes import router as product_router
 from routes.userRoutes import router as user_router
 from routes.orderRoutes import router as order_router
 
-# Load environment variables
-load_dotenv()
-
-# Initialize FastAPI application
-app = FastAPI(
-    title="Ecommerce API",
-    description="E-commerce platform API with product search, orders, and reviews",
-    version="1.0.0"
-)
-
-# Connect to MongoDB (Ecommerce database)
-connect_db()
-
-# Include routers
-app.include_router(product_router, tags=["Products"])
-app.include_router(user_router, tags=["Users"])
-app.include_router(order_router, tags=["Orders"])
-
-@app.get("/")
-def read_root():
-    return {
-        "message": "Welcome to Ecommerce API",
-        "database": "Ecommerce",
-        "version": "1.0.0",
-        "docs": "/docs",
-        "redoc": "/redoc"
-    }
+# Pool warm-up and the registered-index check need the server, so they run after startup
+async def startup_checks(context: AppContext):
+    await context.db.warm()
+    await warn_missing_indexes(context.db.get())
+
+# Create the app's MongoDB client (connections open lazily), cache listener and optional in-memory
+# search index on startup, close them on shutdown. Nothing here waits for the database, so a
+# worker accepts requests as soon as it is imported.
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    context = app.state.context
+    token = use_context(context)
+    await context.start()
+    checks = asyncio.create_task(startup_checks(context))
+    try:
+        yield
+    finally:
+        checks.cancel()
+        await context.close()
+        reset_context(token)
+
+# Application factory: building the app (e.g. to list its routes) opens no connection. Cache,
+# search engine, product summaries and tunables all come from `settings` (default: environment),
+# so apps built with different settings in one process do not share them.
+def create_app(settings: Settings = None) -> FastAPI:
+    context = AppContext(settings) if settings is not None else default_context()
+    settings = context.settings
+
+    # Initialize FastAPI application
+    app = FastAPI(
+        title="Ecommerce API",
+        description="E-commerce platform API with product search, orders, and reviews",
+        version="1.0.0",
+        lifespan=lifespan,
+        default_response_class=MongoJSONResponse
+    )
+    app.state.settings = settings
+    app.state.context = context
+
+    # gzip/brotli for JSON bodies above COMPRESSION_MIN_SIZE (inner, so request timings include it)
+    app.add_middleware(CompressionMiddleware, minimum_size=settings.compression_min_size,
+                       gzip_level=settings.compression_gzip_level,
+                       brotli_quality=settings.compression_brotli_quality)
+
+    # Per-request MongoDB command counts/timings, Server-Timing headers and the slow-request log
+    app.add_middleware(MetricsMiddleware, slow_request_ms=settings.slow_request_ms)
+
+    # Outermost: makes this app's context current for everything below (routes, metrics, compression)
+    app.add_middleware(ContextMiddleware, context=context)
+
+    # Include routers
+    app.include_router(product_router, tags=["Products"])
+    app.include_router(user_router, tags=["Users"])
+    app.include_router(order_router, tags=["Orders"])
+
+    @app.get("/")
+    def read_root():
+        return {
+            "message": "Welcome to Ecommerce API",
+            "database": settings.mongo_db_name,
+            "version": "1.0.0",
+            "docs": "/docs",
+            "redoc": "/redoc"
+        }
+
+    # Cache hit/miss/eviction counters for the read endpoints
+    @app.get("/cache/stats")
+    def cache_stats():
+        return {**context.cache.snapshot(), "productSummaries": context.product_summaries.snapshot()}
+
+    # Prometheus text format: per-route latency histograms and MongoDB command totals (per process)
+    @app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+    def metrics():
+        return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+    return app
+
+# Default application for `uvicorn main:app`
+app = create_app()
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,121 @@
+import argparse
+from bson import ObjectId
+from configure.db import connect_db
+from configure.indexes import INDEXES, create_indexes, diff_indexes, drop_extra_indexes, index_information
+from controllers.productController import build_search_pipeline, REVIEW_SORT
+from controllers.orderController import build_top_products_pipeline
+from controllers.userController import ORDER_SORT
+from services.popularity import SALES_COLLECTION
+
+# =============================
+# Representative controller queries, explained to catch collection scans
+# =============================
+def controller_queries(db):
+    product = db['products'].find_one({}, {"category": 1, "brand": 1, "name": 1}) or {}
+    user = db['users'].find_one({}, {"_id": 1}) or {}
+    product_id = product.get('_id', ObjectId())
+    user_id = user.get('_id', ObjectId())
+    category = product.get('category', 'Electronics')
+
+    return [
+        ("search: text", 'products', build_search_pipeline(
+            "laptop", None, None, None, 0, 10, 'relevance', None)),
+        ("search: category + price", 'products', build_search_pipeline(
+            None, 10, 500, category, 0, 10, 'price_asc', None)),
+        ("search: price range", 'products', build_search_pipeline(
+            None, 10, 500, None, 0, 10, 'price_asc', None)),
+        ("search: text + facets", 'products', build_search_pipeline(
+            "laptop", 10, 500, category, 0, 10, 'relevance', None, facets=True)),
+        ("reviews page", 'reviews', ({"product": product_id}, REVIEW_SORT, 21)),
+        ("user orders page", 'orders', ({"user": user_id}, ORDER_SORT, 21)),
+        ("orders containing product", 'orders', ({"items.product": product_id}, None, 20)),
+        ("top products per category", SALES_COLLECTION, build_top_products_pipeline(30, 5)),
+        ("populate products ($in)", 'products', ({"_id": {"$in": [product_id]}}, None, 0)),
+        ("import natural key", 'products',
+         ({"brand": product.get('brand', ''), "name": product.get('name', '')}, None, 1)),
+    ]
+
+def explain(db, collection, query):
+    if isinstance(query, list):
+        return db.command('explain', {"aggregate": collection, "pipeline": query, "cursor": {}},
+                          verbosity='queryPlanner')
+    query_filter, sort, limit = query
+    cursor = db[collection].find(query_filter).limit(limit)
+    if sort:
+        cursor = cursor.sort(sort)
+    return cursor.explain()
+
+# Every plan stage in an explain document, whatever the nesting ($facet, $cursor, shards)
+def plan_stages(node):
+    if isinstance(node, dict):
+        if isinstance(node.get('stage'), str):
+            yield node['stage']
+        for value in node.values():
+            yield from plan_stages(value)
+    elif isinstance(node, list):
+        for item in node:
+            yield from plan_stages(item)
+
+# =============================
+# Subcommands
+# =============================
+def run_create(db, args):
+    create_indexes(db)
+    print(f"[OK] {sum(len(models) for models in INDEXES.values())} registered indexes ensured")
+    return True
+
+def run_diff(db, args):
+    diff = diff_indexes(index_information(db))
+    for collection, name in diff["missing"]:
+        print(f"[MISSING] {collection}.{name}")
+    for collection, name in diff["changed"]:
+        print(f"[CHANGED] {collection}.{name}")
+    for collection, name in diff["extra"]:
+        print(f"[EXTRA] {collection}.{name}")
+    if not any(diff.values()):
+        print("[OK] Indexes match the registry")
+    return not diff["missing"] and not diff["changed"]
+
+def run_drop(db, args):
+    if not args.yes:
+        for collection, name in diff_indexes(index_information(db))["extra"]:
+            print(f"[..] Would drop {collection}.{name}")
+        print("[SKIP] Re-run with --yes to drop")
+        return True
+    for collection, name in drop_extra_indexes(db):
+        print(f"[OK] Dropped {collection}.{name}")
+    return True
+
+def run_explain(db, args):
+    ok = True
+    for label, collection, query in controller_queries(db):
+        stages = set(plan_stages(explain(db, collection, query)))
+        if 'COLLSCAN' in stages:
+            ok = False
+            print(f"[COLLSCAN] {label} ({collection})")
+        else:
+            print(f"[OK] {label}: {', '.join(sorted(stages))}")
+    return ok
+
+COMMANDS = {"create": run_create, "diff": run_diff, "drop": run_drop, "explain": run_explain}
+
+# Create, diff and drop the registered indexes, or explain controller queries.
+# Exits 1 when `diff` finds missing/changed indexes or `explain` finds a COLLSCAN.
+def run():
+    parser = argparse.ArgumentParser(description="Manage MongoDB indexes from configure/indexes.py")
+    parser.add_argument('command', choices=sorted(COMMANDS))
+    parser.add_argument('--yes', action='store_true', help="Actually drop unregistered indexes")
+    args = parser.parse_args()
+
+    try:
+        db = connect_db()
+        if not COMMANDS[args.command](db, args):
+            exit(1)
+    except Exception as err:
+        print(f"[ERROR] Index {args.command} error: {err}")
+        import traceback
+        traceback.print_exc()
+        exit(1)
+
+if __name__ == '__main__':
+    run()
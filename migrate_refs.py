@@ -0,0 +1,122 @@
+import argparse
+from datetime import datetime
+from bson.errors import InvalidId
+from pymongo import UpdateOne
+from configure.db import connect_db
+from utils.ids import to_object_id
+
+# One-shot migration: rewrite string references to canonical ObjectIds.
+# Progress is checkpointed per collection in the `migrations` collection, so an
+# interrupted run resumes after the last migrated _id.
+MIGRATION_NAME = 'canonical_object_ids'
+
+# collection -> (top-level reference fields, array-of-items reference fields)
+TARGETS = {
+    'orders': (['user'], ['items.product']),
+    'reviews': (['user', 'product'], []),
+}
+
+# Filter matching documents that still hold at least one string reference
+def _string_ref_filter(fields, item_fields):
+    return {"$or": [{field: {"$type": "string"}} for field in fields + item_fields]}
+
+# Compute the $set for one document, or None when it is already canonical.
+# Raises InvalidId when a string reference is not a 24-hex ObjectId.
+def _canonical_update(doc, fields, item_fields):
+    update = {}
+    for field in fields:
+        if isinstance(doc.get(field), str):
+            update[field] = to_object_id(doc[field])
+    for path in item_fields:
+        array_field, item_field = path.split('.', 1)
+        items = doc.get(array_field) or []
+        if any(isinstance(item.get(item_field), str) for item in items):
+            update[array_field] = [
+                {**item, item_field: to_object_id(item[item_field])} if item.get(item_field) else item
+                for item in items
+            ]
+    return update or None
+
+def migrate_collection(db, name, batch_size, restart=False):
+    fields, item_fields = TARGETS[name]
+    collection = db[name]
+    checkpoints = db['migrations']
+    checkpoint_id = f"{MIGRATION_NAME}:{name}"
+
+    checkpoint = None if restart else checkpoints.find_one({"_id": checkpoint_id})
+    if checkpoint and checkpoint.get('done'):
+        print(f"[SKIP] {name}: already migrated")
+        return
+
+    query = _string_ref_filter(fields, item_fields)
+    if checkpoint and checkpoint.get('lastId'):
+        query = {"$and": [query, {"_id": {"$gt": checkpoint['lastId']}}]}
+    remaining = collection.count_documents(query)
+    migrated = checkpoint.get('migrated', 0) if checkpoint else 0
+    invalid = checkpoint.get('invalid', 0) if checkpoint else 0
+    print(f"[..] {name}: {remaining} documents to migrate")
+
+    cursor = collection.find(query, {f: 1 for f in fields + [p.split('.', 1)[0] for p in item_fields]}) \
+                       .sort([("_id", 1)]).batch_size(batch_size)
+    ops = []
+    last_id = None
+    seen = 0
+    for doc in cursor:
+        try:
+            update = _canonical_update(doc, fields, item_fields)
+        except InvalidId:
+            # Left as is for a manual fix; the checkpoint moves past it so a resume does not stop here
+            invalid += 1
+            print(f"[WARN] {name} {doc['_id']}: reference is not a valid ObjectId, left unchanged")
+            update = None
+        if update:
+            ops.append(UpdateOne({"_id": doc['_id']}, {"$set": update}))
+        last_id = doc['_id']
+        seen += 1
+        if seen % batch_size == 0:
+            migrated += _flush(collection, checkpoints, checkpoint_id, ops, last_id, migrated, invalid)
+            if ops:
+                print(f"[..] {name}: {migrated} migrated")
+            ops = []
+    if ops:
+        migrated += _flush(collection, checkpoints, checkpoint_id, ops, last_id, migrated, invalid)
+
+    checkpoints.update_one(
+        {"_id": checkpoint_id},
+        {"$set": {"done": True, "migrated": migrated, "invalid": invalid, "updatedAt": datetime.utcnow()}},
+        upsert=True
+    )
+    print(f"[OK] {name}: {migrated} documents migrated")
+    if invalid:
+        print(f"[WARN] {name}: {invalid} documents with invalid references were left unchanged")
+
+# Write one batch (possibly empty) and record the checkpoint after it
+def _flush(collection, checkpoints, checkpoint_id, ops, last_id, migrated, invalid):
+    modified = collection.bulk_write(ops, ordered=False).modified_count if ops else 0
+    checkpoints.update_one(
+        {"_id": checkpoint_id},
+        {"$set": {"lastId": last_id, "migrated": migrated + modified, "invalid": invalid,
+                  "done": False, "updatedAt": datetime.utcnow()}},
+        upsert=True
+    )
+    return modified
+
+def run():
+    parser = argparse.ArgumentParser(description="Convert string references to ObjectIds")
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--restart', action='store_true', help="Ignore saved checkpoints")
+    args = parser.parse_args()
+
+    try:
+        db = connect_db()
+        for name in TARGETS:
+            migrate_collection(db, name, args.batch_size, restart=args.restart)
+        print("\n[SUCCESS] Reference migration complete")
+    except Exception as err:
+        print(f"[ERROR] Migration error: {err}")
+        import traceback
+        traceback.print_exc()
+        exit(1)
+
+if __name__ == '__main__':
+    run()
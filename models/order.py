@@ -1,6 +1,7 @@
 from datetime import datetime
-from typing import List, Optional
+from typing import List, Optional, Union
 from pydantic import BaseModel, Field
+from models.product import ProductSummary
 
 class OrderItem(BaseModel):
     product: str  # ObjectId as string
@@ -21,4 +22,58 @@ class Order(BaseModel):
         }
 
 class OrderInDB(Order):
-    id: Optional[str] = Field(alias="_id")
\ No newline at end of file
+    id: Optional[str] = Field(alias="_id")
+
+class UserSummary(BaseModel):
+    id: Optional[str] = Field(alias="_id")
+    name: Optional[str] = None
+    email: Optional[str] = None
+
+# Order as returned by the API: references populated with summaries, any field may be trimmed by `fields=`
+class PopulatedOrderItem(BaseModel):
+    product: Union[ProductSummary, str]
+    name: Optional[str] = None
+    price: Optional[float] = None
+    quantity: int = 1
+
+class PopulatedOrder(BaseModel):
+    id: Optional[str] = Field(alias="_id")
+    user: Optional[Union[UserSummary, str]] = None
+    items: Optional[List[PopulatedOrderItem]] = None
+    totalCost: Optional[float] = None
+    status: Optional[str] = None
+    createdAt: Optional[datetime] = None
+
+class OrderPage(BaseModel):
+    limit: int
+    next_cursor: Optional[str] = None
+    results: List[PopulatedOrder]
+
+# POST /orders: the client names products and quantities; names and prices come from the catalog
+class OrderLine(BaseModel):
+    product: str  # ObjectId as string
+    quantity: int = Field(default=1, ge=1, le=1000)
+
+class OrderCreate(BaseModel):
+    user: str  # ObjectId as string
+    items: List[OrderLine] = Field(..., min_length=1, max_length=100)
+
+class OrderCreated(BaseModel):
+    id: str = Field(alias="_id")
+    totalCost: float
+    status: str
+    createdAt: datetime
+
+class OrderBatch(BaseModel):
+    orders: List[OrderCreate] = Field(..., min_length=1, max_length=1000)
+
+class OrderPlaced(OrderCreated):
+    index: int  # position in the request's orders list
+
+class OrderRejected(BaseModel):
+    index: int
+    detail: str
+
+class OrderBatchResult(BaseModel):
+    placed: List[OrderPlaced]
+    rejected: List[OrderRejected]
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 
 class Product(BaseModel):
@@ -21,3 +21,57 @@ class Product(BaseModel):
 class ProductInDB(Product):
     id: Optional[str] = Field(alias="_id")
 
+
+# Search hit as returned by the API; any field may be trimmed by `fields=`
+class ProductSearchResult(BaseModel):
+    name: Optional[str] = None
+    description: Optional[str] = None
+    category: Optional[str] = None
+    brand: Optional[str] = None
+    price: Optional[float] = None
+    stock: Optional[int] = None
+    rating: Optional[float] = None
+    ratingCount: Optional[int] = None
+    createdAt: Optional[datetime] = None
+    id: Optional[str] = Field(alias="_id")
+    score: Optional[float] = None  # MongoDB textScore, only with a query
+    popularity: Optional[int] = None
+    simScore: Optional[float] = None
+    finalScore: Optional[float] = None
+
+class FacetValue(BaseModel):
+    value: str
+    count: int
+
+class FacetRange(BaseModel):
+    min: float
+    max: Optional[float] = None  # None: open-ended top bucket
+    count: int
+
+class SearchFacets(BaseModel):
+    categories: List[FacetValue]
+    brands: List[FacetValue]
+    price: List[FacetRange]
+    rating: List[FacetRange]
+
+class ProductSearchPage(BaseModel):
+    page: int
+    limit: int
+    total: int
+    next_cursor: Optional[str] = None
+    results: List[ProductSearchResult]
+    facets: Optional[SearchFacets] = None  # only with facets=true
+
+class ProductSummary(BaseModel):
+    id: Optional[str] = Field(alias="_id")
+    name: Optional[str] = None
+    brand: Optional[str] = None
+    price: Optional[float] = None
+
+class TopProduct(BaseModel):
+    name: Optional[str] = None
+    sold: int
+
+class CategoryTopProducts(BaseModel):
+    category: str = Field(alias="_id")
+    topProducts: List[TopProduct]
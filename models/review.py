@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 
 class Review(BaseModel):
@@ -16,3 +16,33 @@ class Review(BaseModel):
 
 class ReviewInDB(Review):
     id: Optional[str] = Field(alias="_id")
+
+# Review as returned by the API; any field may be trimmed by `fields=`
+class ReviewResult(BaseModel):
+    user: Optional[str] = None
+    product: Optional[str] = None
+    rating: Optional[int] = None
+    text: Optional[str] = None
+    createdAt: Optional[datetime] = None
+    id: Optional[str] = Field(alias="_id")
+
+class ReviewPage(BaseModel):
+    limit: int
+    next_cursor: Optional[str] = None
+    results: List[ReviewResult]
+
+class ReviewCreated(BaseModel):
+    id: str = Field(alias="_id")
+    message: str
+
+class ReviewBatch(BaseModel):
+    reviews: List[Review] = Field(..., min_length=1, max_length=1000)
+
+class ReviewRejected(BaseModel):
+    index: int
+    detail: str
+
+class ReviewBatchResult(BaseModel):
+    inserted: int
+    products: int
+    rejected: List[ReviewRejected] = []
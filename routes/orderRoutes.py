@@ -1,26 +1,62 @@
-from fastapi import APIRouter
+from typing import List
+from fastapi import APIRouter, Query, Header, status
+from utils.serializer import MongoJSONResponse
+from utils.etag import conditional_response
 from controllers.orderController import (
     get_order_by_id_controller,
-    get_top_products_by_category_controller
+    get_top_products_by_category_controller,
+    create_order_controller,
+    create_orders_batch_controller
 )
+from models.order import PopulatedOrder, OrderCreate, OrderCreated, OrderBatch, OrderBatchResult
+from models.product import CategoryTopProducts
 
 router = APIRouter(prefix="/orders")
 
-# Route 1 — Get Top 5 most purchased products by category (aggregation)
+# Route 1 — Get Top N most purchased products by category (aggregation)
 # IMPORTANT: This must come BEFORE the {order_id} route to avoid conflicts
-# Example: GET /orders/top-products
-@router.get("/top-products")
-async def get_top_products_by_category():
+# Example: GET /orders/top-products?days=30&limit=5
+@router.get("/top-products", response_model=List[CategoryTopProducts])
+async def get_top_products_by_category(
+    days: int = Query(default=30, ge=1, le=365, description="Window size in days, e.g. 7, 30, 90"),
+    limit: int = Query(default=5, ge=1, le=50, description="Products per category"),
+    if_none_match: str = Header(default=None, description="ETag of a previous response; 304 if unchanged")
+):
     """
-    Get top 5 most frequently purchased products in the last month, grouped by category
+    Get the most frequently purchased products over the last `days` days, grouped by category
     """
-    return get_top_products_by_category_controller()
+    return conditional_response(*await get_top_products_by_category_controller(days=days, limit=limit,
+                                                                                 if_none_match=if_none_match))
 
 # Route 2 — Get single order by ID
-# Example: GET /orders/{order_id}
-@router.get("/{order_id}")
-async def get_order_by_id(order_id: str):
+# Example: GET /orders/{order_id}?fields=
+@router.get("/{order_id}", response_model=PopulatedOrder)
+async def get_order_by_id(
+    order_id: str,
+    fields: str = Query(default=None, description="Comma-separated fields to return, e.g. status,totalCost")
+):
     """
     Get a single order by its ID with populated user and product details
     """
-    return get_order_by_id_controller(order_id)
+    return MongoJSONResponse(await get_order_by_id_controller(order_id, fields=fields))
+
+
+# Route 3 — Place an order
+# Example: POST /orders  {"user": "...", "items": [{"product": "...", "quantity": 2}]}
+@router.post("", status_code=status.HTTP_201_CREATED, response_model=OrderCreated)
+async def create_order(order: OrderCreate):
+    """
+    Place an order: prices come from the catalog and stock is reserved atomically (409 when short)
+    """
+    return MongoJSONResponse(await create_order_controller(order), status_code=status.HTTP_201_CREATED)
+
+
+# Route 4 — Place many orders
+# Example: POST /orders/batch  {"orders": [{user, items}, ...]}
+@router.post("/batch", status_code=status.HTTP_201_CREATED, response_model=OrderBatchResult)
+async def create_orders_batch(batch: OrderBatch):
+    """
+    Place many orders in one call; each is placed or rejected on its own, all writes are batched
+    """
+    return MongoJSONResponse(await create_orders_batch_controller(batch.orders),
+                             status_code=status.HTTP_201_CREATED)
@@ -1,16 +1,20 @@
-from fastapi import APIRouter, Query, status
+from fastapi import APIRouter, Query, Header, status
+from utils.serializer import MongoJSONResponse
+from utils.etag import conditional_response
 from controllers.productController import (
     search_products_controller,
     get_product_reviews_controller,
-    post_product_review_controller
+    post_product_review_controller,
+    post_product_reviews_bulk_controller
 )
-from models.review import Review
+from models.review import Review, ReviewPage, ReviewCreated, ReviewBatch, ReviewBatchResult
+from models.product import ProductSearchPage
 
 router = APIRouter(prefix="/products")
 
 # Route 1 — Search Products
-# Example: GET /products/search?query=&minPrice=&maxPrice=&category=&page=&limit=&sort=&budget=
-@router.get("/search")
+# Example: GET /products/search?query=&minPrice=&maxPrice=&category=&page=&limit=&sort=&budget=&cursor=&fields=&facets=
+@router.get("/search", response_model=ProductSearchPage)
 async def search_products(
     query: str = Query(default="", description="Search query for products"),
     minPrice: float = Query(default=None, description="Minimum price filter"),
@@ -19,12 +23,16 @@ async def search_products(
     page: int = Query(default=1, ge=1, description="Page number"),
     limit: int = Query(default=10, ge=1, le=100, description="Items per page"),
     sort: str = Query(default="relevance", description="Sort by: relevance, price_asc, price_desc, popularity"),
-    budget: float = Query(default=None, description="Budget for price relevance")
+    budget: float = Query(default=None, description="Budget for price relevance"),
+    cursor: str = Query(default=None, description="Opaque cursor from a previous next_cursor (overrides page)"),
+    fields: str = Query(default=None, description="Comma-separated fields to return, e.g. name,price"),
+    weights: str = Query(default=None, description="Ranking weights similarity,popularity,price, e.g. 0.5,0.3,0.2"),
+    facets: bool = Query(default=False, description="Also return category, brand, price and rating counts")
 ):
     """
     Search products with filters, pagination, and sorting
     """
-    return search_products_controller(
+    return MongoJSONResponse(await search_products_controller(
         query=query,
         min_price=minPrice,
         max_price=maxPrice,
@@ -32,25 +40,48 @@ async def search_products(
         page=page,
         limit=limit,
         sort=sort,
-        budget=budget
-    )
+        budget=budget,
+        cursor=cursor,
+        fields=fields,
+        weights=weights,
+        facets=facets
+    ))
 
 
 # Route 2 — Get Product Reviews
-# Example: GET /products/{product_id}/reviews
-@router.get("/{product_id}/reviews")
-async def get_product_reviews(product_id: str):
+# Example: GET /products/{product_id}/reviews?limit=&cursor=&fields=
+@router.get("/{product_id}/reviews", response_model=ReviewPage)
+async def get_product_reviews(
+    product_id: str,
+    limit: int = Query(default=20, ge=1, le=100, description="Reviews per page"),
+    cursor: str = Query(default=None, description="Opaque cursor from a previous next_cursor"),
+    fields: str = Query(default=None, description="Comma-separated fields to return, e.g. rating,text"),
+    if_none_match: str = Header(default=None, description="ETag of a previous response; 304 if unchanged")
+):
     """
-    Get all reviews for a specific product
+    Get reviews for a specific product, newest first, one page at a time
     """
-    return get_product_reviews_controller(product_id)
+    return conditional_response(*await get_product_reviews_controller(product_id, limit=limit, cursor=cursor,
+                                                                        fields=fields, if_none_match=if_none_match))
 
 
 # Route 3 — Post Product Review
 # Example: POST /products/{product_id}/reviews
-@router.post("/{product_id}/reviews", status_code=status.HTTP_201_CREATED)
+@router.post("/{product_id}/reviews", status_code=status.HTTP_201_CREATED, response_model=ReviewCreated)
 async def post_product_review(product_id: str, review: Review):
     """
     Add a new review for a product
     """
-    return post_product_review_controller(product_id, review)
+    return MongoJSONResponse(await post_product_review_controller(product_id, review),
+                             status_code=status.HTTP_201_CREATED)
+
+
+# Route 4 — Bulk Review Ingest
+# Example: POST /products/reviews/bulk  {"reviews": [{user, product, rating, text}, ...]}
+@router.post("/reviews/bulk", status_code=status.HTTP_201_CREATED, response_model=ReviewBatchResult)
+async def post_product_reviews_bulk(batch: ReviewBatch):
+    """
+    Add many reviews at once; each product's rating is updated with a single write
+    """
+    return MongoJSONResponse(await post_product_reviews_bulk_controller(batch.reviews),
+                             status_code=status.HTTP_201_CREATED)
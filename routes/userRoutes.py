@@ -1,13 +1,22 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Query, Header
+from utils.etag import conditional_response
 from controllers.userController import get_user_orders_controller
+from models.order import OrderPage
 
 router = APIRouter(prefix="/users")
 
 # Route — Get user orders
-# Example: GET /users/{user_id}/orders
-@router.get("/{user_id}/orders")
-async def get_user_orders(user_id: str):
+# Example: GET /users/{user_id}/orders?limit=&cursor=&fields=
+@router.get("/{user_id}/orders", response_model=OrderPage)
+async def get_user_orders(
+    user_id: str,
+    limit: int = Query(default=20, ge=1, le=100, description="Orders per page"),
+    cursor: str = Query(default=None, description="Opaque cursor from a previous next_cursor"),
+    fields: str = Query(default=None, description="Comma-separated fields to return, e.g. status,totalCost"),
+    if_none_match: str = Header(default=None, description="ETag of a previous response; 304 if unchanged")
+):
     """
-    Get all orders for a specific user
+    Get orders for a specific user, newest first, one page at a time
     """
-    return get_user_orders_controller(user_id)
+    return conditional_response(*await get_user_orders_controller(user_id, limit=limit, cursor=cursor,
+                                                                    fields=fields, if_none_match=if_none_match))
@@ -1,11 +1,10 @@
 import os
-import json
-from dotenv import load_dotenv
 from configure.db import connect_db, get_db
+from configure.indexes import create_indexes
+from services.importer import import_file, create_natural_key_indexes
+from services.popularity import record_order_sales, SALES_COLLECTION
 from datetime import datetime
 
-load_dotenv()
-
 # Get data directory
 data_dir = os.path.join(os.path.dirname(__file__), 'data')
 
@@ -20,65 +19,50 @@ def run():
         orders_collection = db['orders']
         reviews_collection = db['reviews']
 
-        # Read files
+        # Data files (JSON arrays or NDJSON, streamed record by record)
         products_file = os.path.join(data_dir, 'products.json')
         users_file = os.path.join(data_dir, 'users.json')
-        
-        with open(products_file, 'r', encoding='utf-8') as f:
-            prod_data = json.load(f)
-
-        with open(users_file, 'r', encoding='utf-8') as f:
-            users_data = json.load(f)
+        for path in (products_file, users_file):
+            if not os.path.exists(path):
+                raise FileNotFoundError(path)
 
         # Clear collections
         products_collection.delete_many({})
         users_collection.delete_many({})
         orders_collection.delete_many({})
         reviews_collection.delete_many({})
+        db[SALES_COLLECTION].delete_many({})
+        db['imports'].delete_many({})
         
         print("[OK] Collections cleared")
 
-        # Add timestamps to products if not present
-        for product in prod_data:
-            if 'createdAt' not in product:
-                product['createdAt'] = datetime.utcnow()
-            if 'rating' not in product:
-                product['rating'] = 0.0
-            if 'ratingCount' not in product:
-                product['ratingCount'] = 0
-
-        # Add timestamps to users if not present
-        for user in users_data:
-            if 'createdAt' not in user:
-                user['createdAt'] = datetime.utcnow()
-
-        # Insert products and users
-        products_result = products_collection.insert_many(prod_data)
-        users_result = users_collection.insert_many(users_data)
-        
-        products_ids = products_result.inserted_ids
-        users_ids = users_result.inserted_ids
+        # Upsert products and users in bulk batches keyed on their natural keys
+        # (defaults such as rating, totalSold and createdAt are set on insert)
+        create_natural_key_indexes(db)
+        products_stats = import_file(db, 'products', products_file, resume=False)
+        users_stats = import_file(db, 'users', users_file, resume=False)
 
-        print(f"[OK] Products inserted: {len(products_ids)}")
-        print(f"[OK] Users inserted: {len(users_ids)}")
+        print(f"[OK] Products inserted: {products_stats['upserted']}")
+        print(f"[OK] Users inserted: {users_stats['upserted']}")
 
         # Create a sample order: user 0 buys product 0 and 1
-        if len(users_ids) > 0 and len(products_ids) >= 2:
-            # Fetch the first two products to get their details
-            product1 = products_collection.find_one({'_id': products_ids[0]})
-            product2 = products_collection.find_one({'_id': products_ids[1]})
+        products = list(products_collection.find({}, {'name': 1, 'price': 1, 'category': 1})
+                        .sort([('_id', 1)]).limit(2))
+        user = users_collection.find_one({}, {'_id': 1}, sort=[('_id', 1)])
+        if user and len(products) >= 2:
+            product1, product2 = products
             
             sample_order = {
-                'user': users_ids[0],
+                'user': user['_id'],
                 'items': [
                     {
-                        'product': str(products_ids[0]),
+                        'product': product1['_id'],
                         'name': product1.get('name'),
                         'price': product1.get('price'),
                         'quantity': 1
                     },
                     {
-                        'product': str(products_ids[1]),
+                        'product': product2['_id'],
                         'name': product2.get('name'),
                         'price': product2.get('price'),
                         'quantity': 2
@@ -90,16 +74,13 @@ def run():
             }
             
             order_result = orders_collection.insert_one(sample_order)
+            record_order_sales(db, sample_order, {p['_id']: p for p in products})
             print(f"[OK] Sample order created: {order_result.inserted_id}")
 
-        # Create text index on products for search functionality
+        # Build secondary indexes (text search, filters, pagination, popularity) after loading
         try:
-            products_collection.create_index([
-                ('name', 'text'),
-                ('description', 'text'),
-                ('brand', 'text')
-            ])
-            print("[OK] Text index created on products collection")
+            create_indexes(db)
+            print("[OK] Text, search, pagination and popularity indexes created")
         except Exception as e:
             print(f"[NOTE] Index creation note: {e}")
 
@@ -0,0 +1,476 @@
+import json
+import math
+import time
+import asyncio
+import sqlite3
+import threading
+from contextlib import contextmanager
+from collections import OrderedDict
+from utils.codec import pack, unpack
+
+# Per-endpoint time-to-live in seconds
+def cache_ttls(settings) -> dict:
+    return {
+        'search': settings.cache_ttl_search,
+        'reviews': settings.cache_ttl_reviews,
+        'top_products': settings.cache_ttl_top_products,
+    }
+
+# Tag helpers shared by the controllers that fill and invalidate the cache
+def product_tag(product_id) -> str:
+    return f"product:{product_id}"
+
+def reviews_tag(product_id) -> str:
+    return f"reviews:{product_id}"
+
+# Stable string form of a cache key tuple, used by the shared backends
+def key_string(key) -> str:
+    return json.dumps(key, default=str, separators=(',', ':'))
+
+
+# =============================
+# Backends
+# =============================
+class CacheBackend:
+    """Storage behind the cache. Shared backends are visible to every worker process."""
+
+    shared = False
+
+    async def get(self, key):
+        """Return (found, value)"""
+        raise NotImplementedError
+
+    async def set(self, key, value, ttl: float, tags=()):
+        raise NotImplementedError
+
+    async def invalidate_tags(self, tags):
+        """Drop every entry carrying one of tags and notify the other workers"""
+        raise NotImplementedError
+
+    async def clear(self):
+        raise NotImplementedError
+
+    async def listen(self, callback):
+        """Call callback(tags) for each invalidation broadcast by any worker; runs until cancelled"""
+
+    async def close(self):
+        pass
+
+    def snapshot(self):
+        return {}
+
+
+class MemoryBackend(CacheBackend):
+    """Bounded in-process LRU with per-entry TTL; values are stored as-is"""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()   # key -> (expires_at, value, tags)
+        self._tags = {}                 # tag -> set of keys
+        self.stats = {"evictions": 0, "expirations": 0, "invalidations": 0}
+
+    async def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        expires_at, value, _ = entry
+        if expires_at < time.monotonic():
+            self._remove(key)
+            self.stats["expirations"] += 1
+            return False, None
+        self._entries.move_to_end(key)
+        return True, value
+
+    async def set(self, key, value, ttl: float, tags=()):
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (time.monotonic() + ttl, value, tuple(tags))
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.stats["evictions"] += 1
+
+    async def invalidate_tags(self, tags):
+        for tag in tags:
+            for key in list(self._tags.get(tag, ())):
+                self._remove(key)
+                self.stats["invalidations"] += 1
+
+    async def clear(self):
+        self._entries.clear()
+        self._tags.clear()
+
+    def snapshot(self):
+        return {**self.stats, "entries": len(self._entries), "maxEntries": self.max_entries}
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+
+class FileBackend(CacheBackend):
+    """SQLite file shared by every worker on one host; needs no external service.
+
+    Invalidations are appended to a log table that each worker polls.
+    """
+
+    shared = True
+
+    def __init__(self, path: str, max_entries: int = 10000, poll_interval: float = 0.5):
+        self.path = path
+        self.max_entries = max_entries
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS entries "
+                           "(key TEXT PRIMARY KEY, value BLOB, expires_at REAL)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS tags "
+                           "(tag TEXT, key TEXT, PRIMARY KEY (tag, key))")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS invalidations "
+                           "(id INTEGER PRIMARY KEY AUTOINCREMENT, tags BLOB, created_at REAL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_expires_at ON entries (expires_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS tags_key ON tags (key)")
+        # Tag rows left behind by files written before entries and tags were removed together
+        self._conn.execute("DELETE FROM tags WHERE key NOT IN (SELECT key FROM entries)")
+
+    def _run(self, fn, *args):
+        def locked():
+            with self._lock:
+                return fn(*args)
+        return asyncio.to_thread(locked)
+
+    # The connection autocommits (isolation_level=None), so multi-statement writes open their own
+    @contextmanager
+    def _transaction(self):
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    # Invalidation log rows are kept this long: a few polls of the slowest listener
+    @property
+    def log_retention(self) -> float:
+        return max(10 * self.poll_interval, 5.0)
+
+    # Remove entries and their tag rows; called inside the caller's transaction
+    def _delete_keys(self, keys):
+        rows = [(k,) for k in keys]
+        self._conn.executemany("DELETE FROM entries WHERE key = ?", rows)
+        self._conn.executemany("DELETE FROM tags WHERE key = ?", rows)
+
+    def _select_keys(self, query, params=()):
+        return [row[0] for row in self._conn.execute(query, params).fetchall()]
+
+    async def get(self, key):
+        def read(k):
+            row = self._conn.execute("SELECT value, expires_at FROM entries WHERE key = ?",
+                                     (k,)).fetchone()
+            if row is None:
+                return None
+            if row[1] < time.time():
+                with self._transaction():
+                    self._delete_keys([k])
+                return None
+            return row[0]
+        data = await self._run(read, key_string(key))
+        if data is None:
+            return False, None
+        return True, unpack(data)
+
+    async def set(self, key, value, ttl: float, tags=()):
+        def write(k, data, expires_at):
+            with self._transaction():
+                # A replaced entry starts over with the new tags only
+                self._conn.execute("DELETE FROM tags WHERE key = ?", (k,))
+                self._conn.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?)",
+                                   (k, data, expires_at))
+                self._conn.executemany("INSERT OR IGNORE INTO tags VALUES (?, ?)",
+                                       [(tag, k) for tag in tags])
+                # Keep the file bounded: sweep expired entries, then drop those closest to expiry
+                self._delete_keys(self._select_keys("SELECT key FROM entries WHERE expires_at < ?",
+                                                    (time.time(),)))
+                self._delete_keys(self._select_keys(
+                    "SELECT key FROM entries ORDER BY expires_at "
+                    "LIMIT max(0, (SELECT count(*) FROM entries) - ?)", (self.max_entries,)))
+        await self._run(write, key_string(key), pack(value), time.time() + ttl)
+
+    async def invalidate_tags(self, tags):
+        def invalidate(tag_list):
+            now = time.time()
+            with self._transaction():
+                for tag in tag_list:
+                    self._delete_keys(self._select_keys("SELECT key FROM tags WHERE tag = ?", (tag,)))
+                self._conn.execute("INSERT INTO invalidations (tags, created_at) VALUES (?, ?)",
+                                   (pack(tag_list), now))
+                # The log only has to outlive a few polls, listening or not
+                self._conn.execute("DELETE FROM invalidations WHERE created_at < ?",
+                                   (now - self.log_retention,))
+        await self._run(invalidate, list(tags))
+
+    async def clear(self):
+        def clear_all():
+            with self._transaction():
+                self._conn.execute("DELETE FROM entries")
+                self._conn.execute("DELETE FROM tags")
+        await self._run(clear_all)
+
+    async def listen(self, callback):
+        def latest():
+            return self._conn.execute("SELECT coalesce(max(id), 0) FROM invalidations").fetchone()[0]
+
+        def since(last_id):
+            rows = self._conn.execute("SELECT id, tags FROM invalidations WHERE id > ? ORDER BY id",
+                                      (last_id,)).fetchall()
+            self._conn.execute("DELETE FROM invalidations WHERE created_at < ?",
+                               (time.time() - self.log_retention,))
+            return rows
+
+        last_id = await self._run(latest)
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            for row_id, tags in await self._run(since, last_id):
+                last_id = row_id
+                callback(unpack(tags))
+
+    async def close(self):
+        await self._run(self._conn.close)
+
+    def snapshot(self):
+        return {"path": self.path, "maxEntries": self.max_entries}
+
+
+class RedisBackend(CacheBackend):
+    """Redis (or any Redis-protocol server) shared by all workers; invalidations use pub/sub"""
+
+    shared = True
+
+    def __init__(self, url: str, prefix: str = "ecommerce:cache:"):
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError("CACHE_BACKEND=redis requires the 'redis' package (pip install redis)")
+        self._redis = redis.from_url(url)
+        self.prefix = prefix
+        self.channel = f"{prefix}invalidate"
+
+    def _key(self, key):
+        return f"{self.prefix}entry:{key_string(key)}"
+
+    def _tag(self, tag):
+        return f"{self.prefix}tag:{tag}"
+
+    async def get(self, key):
+        data = await self._redis.get(self._key(key))
+        if data is None:
+            return False, None
+        return True, unpack(data)
+
+    async def set(self, key, value, ttl: float, tags=()):
+        seconds = max(1, math.ceil(ttl))
+        redis_key = self._key(key)
+        pipe = self._redis.pipeline(transaction=False)
+        pipe.set(redis_key, pack(value), ex=seconds)
+        for tag in tags:
+            pipe.sadd(self._tag(tag), redis_key)
+            pipe.expire(self._tag(tag), seconds)
+        await pipe.execute()
+
+    async def invalidate_tags(self, tags):
+        tags = list(tags)
+        for tag in tags:
+            keys = await self._redis.smembers(self._tag(tag))
+            await self._redis.delete(self._tag(tag), *keys)
+        await self._redis.publish(self.channel, pack(tags))
+
+    async def clear(self):
+        keys = [key async for key in self._redis.scan_iter(match=f"{self.prefix}*")]
+        if keys:
+            await self._redis.delete(*keys)
+
+    async def listen(self, callback):
+        pubsub = self._redis.pubsub()
+        await pubsub.subscribe(self.channel)
+        try:
+            async for message in pubsub.listen():
+                if message.get("type") == "message":
+                    callback(unpack(message["data"]))
+        finally:
+            await pubsub.aclose()
+
+    async def close(self):
+        await self._redis.aclose()
+
+    def snapshot(self):
+        return {"prefix": self.prefix}
+
+
+# =============================
+# Cache front: coalescing, stats and an optional local tier
+# =============================
+class Cache:
+    """Read-through cache with request coalescing over a pluggable backend.
+
+    With a shared backend a small in-process tier (short TTL) sits in front of it and is
+    cleared whenever any worker broadcasts an invalidation.
+    """
+
+    def __init__(self, backend: CacheBackend, local: MemoryBackend = None, local_ttl: float = 5):
+        self.backend = backend
+        self.local = local
+        self.local_ttl = local_ttl
+        self._inflight = {}             # key -> Future shared by concurrent misses
+        self._generation = 0            # bumped on invalidation so in-flight loads are not stored
+        self._listener = None
+        self._subscribers = []          # callbacks(tags) of in-process caches kept in step with this one
+        self.stats = {"hits": 0, "localHits": 0, "misses": 0, "coalesced": 0, "errors": 0}
+
+    async def start(self):
+        if self.backend.shared and self._listener is None:
+            self._listener = asyncio.create_task(self.backend.listen(self._on_invalidation))
+
+    async def close(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        await self.backend.close()
+
+    async def get_or_load(self, key, loader, ttl: float, tags=()):
+        """Return the cached value or await loader() once for all concurrent callers.
+
+        tags may be an iterable or a callable receiving the loaded value.
+        """
+        if self.local is not None:
+            found, value = await self.local.get(key)
+            if found:
+                self.stats["localHits"] += 1
+                return value
+
+        while key in self._inflight:
+            inflight = self._inflight[key]
+            self.stats["coalesced"] += 1
+            try:
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                # This caller was cancelled itself, or the leader was: then a waiter takes over the load
+                if asyncio.current_task().cancelling() or not inflight.cancelled():
+                    raise
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        generation = self._generation
+        try:
+            found, value = await self._backend_get(key)
+            if found:
+                self.stats["hits"] += 1
+            else:
+                self.stats["misses"] += 1
+                value = await loader()
+        except Exception as err:
+            future.set_exception(err)
+            future.exception()  # mark retrieved when nobody else was waiting
+            raise
+        except BaseException:
+            # Cancellation (client disconnect, timeout) belongs to this caller only
+            future.cancel()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+        future.set_result(value)
+        # Skip storing a value that may predate an invalidation issued while it loaded;
+        # a TTL of 0 disables caching (concurrent identical requests are still coalesced)
+        if generation == self._generation and ttl > 0:
+            entry_tags = list(tags(value) if callable(tags) else tags)
+            if not found:
+                await self._backend_set(key, value, ttl, entry_tags)
+            if self.local is not None and self.local_ttl > 0:
+                await self.local.set(key, value, min(ttl, self.local_ttl), entry_tags)
+        return value
+
+    def subscribe(self, callback):
+        """Call callback(tags) for every invalidation, local or broadcast by another worker"""
+        self._subscribers.append(callback)
+
+    async def invalidate_tags(self, *tags):
+        self._generation += 1
+        self._notify(tags)
+        if self.local is not None:
+            await self.local.invalidate_tags(tags)
+        # Like reads, a failing shared backend must not fail the write that triggered this
+        try:
+            await self.backend.invalidate_tags(tags)
+        except Exception as err:
+            self.stats["errors"] += 1
+            print(f"Cache backend error: {err}")
+
+    async def clear(self):
+        self._generation += 1
+        if self.local is not None:
+            await self.local.clear()
+        await self.backend.clear()
+
+    def snapshot(self):
+        snapshot = {**self.stats, "backend": type(self.backend).__name__,
+                    **self.backend.snapshot()}
+        if self.local is not None:
+            snapshot["local"] = self.local.snapshot()
+        return snapshot
+
+    def _on_invalidation(self, tags):
+        self._generation += 1
+        self._notify(tags)
+        if self.local is not None:
+            asyncio.ensure_future(self.local.invalidate_tags(tags))
+
+    def _notify(self, tags):
+        for callback in self._subscribers:
+            callback(tags)
+
+    # A failing shared backend degrades to uncached reads instead of failing the request
+    async def _backend_get(self, key):
+        try:
+            return await self.backend.get(key)
+        except Exception as err:
+            self.stats["errors"] += 1
+            print(f"Cache backend error: {err}")
+            return False, None
+
+    async def _backend_set(self, key, value, ttl, tags):
+        try:
+            await self.backend.set(key, value, ttl, tags)
+        except Exception as err:
+            self.stats["errors"] += 1
+            print(f"Cache backend error: {err}")
+
+
+# Build an application's cache from CACHE_BACKEND (memory, file or redis)
+def create_cache(settings) -> Cache:
+    backend_name = settings.cache_backend
+    max_entries = settings.cache_max_entries
+    if backend_name == 'memory':
+        return Cache(MemoryBackend(max_entries))
+
+    if backend_name == 'file':
+        backend = FileBackend(settings.cache_file, max_entries=settings.cache_file_max_entries)
+    elif backend_name == 'redis':
+        backend = RedisBackend(settings.cache_url)
+    else:
+        raise ValueError(f"Unknown CACHE_BACKEND: {backend_name}")
+    return Cache(backend, local=MemoryBackend(max_entries), local_ttl=settings.cache_local_ttl)
@@ -0,0 +1,63 @@
+# Facet counts returned next to a search page (/products/search?facets=true).
+# Category and price counts ignore their own filter, so a sidebar can still offer the other
+# categories and price ranges; brand and rating counts apply every filter.
+
+# Lower bounds of the price histogram; the last bucket is open-ended
+PRICE_BUCKETS = [0, 25, 50, 100, 250, 500, 1000, 2500]
+# Star buckets 0-1 .. 4-5, by the floor of the mean rating (unrated products count as 0)
+RATING_BUCKETS = 5
+# Most frequent brands returned
+FACET_LIMIT = 20
+
+# $facet branches for the MongoDB search pipeline; each *_match is the filter its counts respect
+def build_facet_branches(filters: dict, price_match: dict, category_match: dict) -> dict:
+    def matched(match, *stages):
+        return ([{"$match": match}] if match else []) + list(stages)
+
+    def count_by(key):
+        return {"$group": {"_id": key, "count": {"$sum": 1}}}
+
+    return {
+        "categories": matched(price_match, count_by("$category")),
+        "brands": matched(filters, count_by("$brand"),
+                          {"$sort": {"count": -1, "_id": 1}}, {"$limit": FACET_LIMIT}),
+        "price": matched(category_match, {"$bucket": {
+            "groupBy": "$price", "boundaries": PRICE_BUCKETS, "default": PRICE_BUCKETS[-1]
+        }}),
+        "rating": matched(filters, count_by(
+            {"$min": [{"$floor": {"$ifNull": ["$rating", 0]}}, RATING_BUCKETS - 1]}
+        )),
+    }
+
+# {value: count} -> [{"value", "count"}], most frequent first
+def value_counts(counts: dict, limit: int = None) -> list:
+    ordered = sorted(((value, count) for value, count in counts.items() if value is not None and count),
+                     key=lambda pair: (-pair[1], str(pair[0])))
+    return [{"value": value, "count": count} for value, count in ordered[:limit]]
+
+# {lower bound: count} -> [{"min", "max", "count"}] in ascending order
+def ranges(counts: dict, bounds: list) -> list:
+    result = []
+    for i, lower in enumerate(bounds):
+        if counts.get(lower):
+            upper = bounds[i + 1] if i + 1 < len(bounds) else None
+            result.append({"min": lower, "max": upper, "count": counts[lower]})
+    return result
+
+# Raw counts ({facet: {key: count}}) -> response shape; shared by the pipeline and the in-memory engine
+def format_facets(counts: dict) -> dict:
+    rating_bounds = list(range(RATING_BUCKETS))
+    rating = ranges({int(key): count for key, count in counts['rating'].items()}, rating_bounds)
+    for bucket in rating:
+        bucket["max"] = bucket["min"] + 1
+    return {
+        "categories": value_counts(counts['categories']),
+        "brands": value_counts(counts['brands'], FACET_LIMIT),
+        "price": ranges(counts['price'], PRICE_BUCKETS),
+        "rating": rating,
+    }
+
+# $facet output ({facet: [{"_id", "count"}]}) -> raw counts
+def pipeline_counts(result: dict) -> dict:
+    return {name: {doc['_id']: doc['count'] for doc in result.get(name, [])}
+            for name in ('categories', 'brands', 'price', 'rating')}
@@ -0,0 +1,198 @@
+import os
+import re
+import json
+import time
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from pymongo import UpdateOne
+from configure.indexes import create_indexes, LOAD_INDEXES
+
+# Natural keys used to upsert catalog records, so re-running an import never duplicates them
+NATURAL_KEYS = {
+    'products': ('brand', 'name'),
+    'users': ('email',),
+}
+
+# Fields initialized only when a record is first inserted
+def insert_defaults(collection: str, now: datetime) -> dict:
+    if collection == 'products':
+        return {"rating": 0.0, "ratingCount": 0, "ratingSum": 0, "totalSold": 0, "createdAt": now}
+    if collection == 'users':
+        return {"totalSpent": 0.0, "purchaseCount": 0, "createdAt": now}
+    return {"createdAt": now}
+
+# =============================
+# Incremental parsing: JSON arrays or NDJSON, one record at a time
+# =============================
+def iter_records(path: str, chunk_size: int = 1 << 16):
+    with open(path, 'r', encoding='utf-8') as f:
+        # The format is decided by the first non-whitespace character, however many chunks away
+        head = f.read(chunk_size)
+        while head and not head.strip():
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            head += chunk
+        stripped = head.lstrip()
+        if stripped.startswith('['):
+            yield from _iter_json_array(f, stripped[1:], chunk_size)
+            return
+        # NDJSON: one document per line
+        buffer = head
+        while True:
+            *lines, buffer = buffer.split('\n')
+            for line in lines:
+                if line.strip():
+                    yield json.loads(line)
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            buffer += chunk
+        if buffer.strip():
+            yield json.loads(buffer)
+
+# Only characters that can continue a JSON number until the end of the buffer
+NUMBER_TAIL = re.compile(r'[0-9+\-.eE]*\Z')
+
+def _iter_json_array(f, buffer: str, chunk_size: int):
+    decoder = json.JSONDecoder()
+    pos = 0
+    eof = False
+    while True:
+        # Skip separators between elements
+        while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+            pos += 1
+        if pos < len(buffer) and buffer[pos] == ']':
+            return
+        try:
+            if pos >= len(buffer):
+                raise ValueError("need more data")
+            record, end = decoder.raw_decode(buffer, pos)
+            # A number running into the end of the buffer may continue in the next chunk
+            # ("12" of "1234", or "12.5" of "12.5e3")
+            if not eof and NUMBER_TAIL.match(buffer, end):
+                raise ValueError("need more data")
+        except ValueError:
+            if eof:
+                raise ValueError("Unexpected end of JSON array")
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buffer = buffer[pos:] + chunk
+            pos = 0
+            continue
+        yield record
+        pos = end
+
+def iter_batches(records, batch_size: int):
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+# =============================
+# Bulk upserts
+# =============================
+def build_upserts(collection: str, records, now: datetime):
+    key_fields = NATURAL_KEYS[collection]
+    defaults = insert_defaults(collection, now)
+    ops = []
+    for record in records:
+        record.pop('_id', None)
+        record.pop('updatedAt', None)
+        missing = [field for field in key_fields if record.get(field) is None]
+        if missing:
+            raise ValueError(f"{collection} record missing natural key field(s) {missing}: {record}")
+        on_insert = {k: v for k, v in defaults.items() if k not in record}
+        update = {"$set": record, "$currentDate": {"updatedAt": True}}
+        if on_insert:
+            update["$setOnInsert"] = on_insert
+        ops.append(UpdateOne({field: record[field] for field in key_fields}, update, upsert=True))
+    return ops
+
+def _write_batch(db, collection: str, batch):
+    result = db[collection].bulk_write(build_upserts(collection, batch, datetime.utcnow()),
+                                       ordered=False)
+    return result.upserted_count, result.modified_count
+
+# Import one file into a collection with parallel unordered bulk upserts.
+# The number of records confirmed written (a contiguous prefix of the file) is checkpointed in
+# the `imports` collection together with the file's size and mtime; a later run with resume=True
+# skips that prefix (or the whole file) only while the file is unchanged.
+def import_file(db, collection: str, path: str, batch_size: int = 1000, workers: int = 4,
+                resume: bool = True, progress_every: float = 5.0):
+    checkpoints = db['imports']
+    checkpoint_id = f"{collection}:{path}"
+    stat = os.stat(path)
+    version = {"size": stat.st_size, "mtime": stat.st_mtime}
+    checkpoint = checkpoints.find_one({"_id": checkpoint_id}) if resume else None
+    if checkpoint and {key: checkpoint.get(key) for key in version} != version:
+        print(f"[..] {collection}: {path} changed since the last import, starting over")
+        checkpoint = None
+    skip = checkpoint.get('records', 0) if checkpoint and not checkpoint.get('done') else 0
+    if checkpoint and checkpoint.get('done') and resume:
+        print(f"[SKIP] {collection}: {path} already imported")
+        return {"records": 0, "upserted": 0, "modified": 0, "seconds": 0.0, "rate": 0.0}
+
+    records = iter_records(path)
+    for _ in range(skip):
+        next(records, None)
+    if skip:
+        print(f"[..] {collection}: resuming after {skip} records")
+
+    stats = {"records": 0, "upserted": 0, "modified": 0}
+    started = last_report = time.monotonic()
+    done = {}            # batch number -> size, for batches finished out of order
+    next_batch = 0       # lowest batch number not yet confirmed
+    confirmed = skip     # records in the confirmed contiguous prefix
+
+    def save_checkpoint(is_done=False):
+        checkpoints.update_one(
+            {"_id": checkpoint_id},
+            {"$set": {"records": confirmed, "done": is_done, **version, "updatedAt": datetime.utcnow()}},
+            upsert=True
+        )
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = {}
+
+        def collect(futures):
+            nonlocal next_batch, confirmed
+            for future in futures:
+                upserted, modified = future.result()
+                number, size = pending.pop(future)
+                stats["upserted"] += upserted
+                stats["modified"] += modified
+                stats["records"] += size
+                done[number] = size
+            while next_batch in done:
+                confirmed += done.pop(next_batch)
+                next_batch += 1
+            save_checkpoint()
+
+        for number, batch in enumerate(iter_batches(records, batch_size)):
+            pending[pool.submit(_write_batch, db, collection, batch)] = (number, len(batch))
+            # Bound in-flight batches so memory stays proportional to workers * batch_size
+            if len(pending) >= workers * 2:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect(finished)
+                if time.monotonic() - last_report >= progress_every:
+                    last_report = time.monotonic()
+                    rate = stats["records"] / (last_report - started)
+                    print(f"[..] {collection}: {stats['records']} records, {rate:,.0f}/s")
+
+        collect(list(pending))
+
+    save_checkpoint(is_done=True)
+    stats["seconds"] = time.monotonic() - started
+    stats["rate"] = stats["records"] / stats["seconds"] if stats["seconds"] else 0.0
+    print(f"[OK] {collection}: {stats['records']} records ({stats['upserted']} new, "
+          f"{stats['modified']} updated) in {stats['seconds']:.1f}s, {stats['rate']:,.0f}/s")
+    return stats
+
+# Unique natural-key indexes; created before loading because every upsert looks records up by them
+def create_natural_key_indexes(db):
+    create_indexes(db, names=LOAD_INDEXES)
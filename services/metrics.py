@@ -0,0 +1,180 @@
+import time
+import bisect
+import contextvars
+from bson import json_util
+from pymongo import monitoring
+from configure.settings import Settings
+
+# Requests slower than this (milliseconds) are logged with their slowest MongoDB command;
+# create_app passes the application's SLOW_REQUEST_MS
+SLOW_REQUEST_MS = Settings.slow_request_ms
+# Latency histogram bucket bounds, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Longest command text kept for the slow-request log
+MAX_COMMAND_CHARS = 2000
+
+# =============================
+# Per-request stats, carried in a context variable so concurrent requests never mix
+# =============================
+class RequestStats:
+    __slots__ = ('commands', 'db_seconds', 'slowest', 'slowest_seconds', 'serialize_seconds', 'pending')
+
+    def __init__(self):
+        self.commands = 0
+        self.db_seconds = 0.0
+        self.slowest = None          # (command name, command document)
+        self.slowest_seconds = 0.0
+        self.serialize_seconds = 0.0
+        self.pending = {}            # (connection, request id) -> (command name, command document)
+
+_current = contextvars.ContextVar('request_stats', default=None)
+
+def current_stats():
+    return _current.get()
+
+# Time spent encoding the response body (utils/serializer.py)
+def record_serialize(seconds: float):
+    stats = _current.get()
+    if stats is not None:
+        stats.serialize_seconds += seconds
+
+class CommandTimer(monitoring.CommandListener):
+    """Counts and times every MongoDB command issued while a request is being served"""
+
+    def started(self, event):
+        stats = _current.get()
+        if stats is not None:
+            stats.pending[(event.connection_id, event.request_id)] = (event.command_name, event.command)
+
+    def succeeded(self, event):
+        self._finish(event)
+
+    def failed(self, event):
+        self._finish(event)
+
+    def _finish(self, event):
+        stats = _current.get()
+        if stats is None:
+            return
+        name, command = stats.pending.pop((event.connection_id, event.request_id), (event.command_name, None))
+        seconds = event.duration_micros / 1e6
+        stats.commands += 1
+        stats.db_seconds += seconds
+        if seconds >= stats.slowest_seconds:
+            stats.slowest = (name, command)
+            stats.slowest_seconds = seconds
+
+command_timer = CommandTimer()
+
+# =============================
+# Per-route metrics, rendered in the Prometheus text format
+# =============================
+class RouteMetrics:
+    __slots__ = ('buckets', 'count', 'seconds', 'statuses', 'commands', 'db_seconds')
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.seconds = 0.0
+        self.statuses = {}
+        self.commands = 0
+        self.db_seconds = 0.0
+
+    def observe(self, seconds: float, status: int, stats: RequestStats):
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.count += 1
+        self.seconds += seconds
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        self.commands += stats.commands
+        self.db_seconds += stats.db_seconds
+
+_routes = {}   # (method, route template) -> RouteMetrics
+
+def _labels(method: str, route: str, **extra) -> str:
+    pairs = {"method": method, "route": route, **extra}
+    return ",".join(f'{key}="{value}"' for key, value in pairs.items())
+
+def render_metrics() -> str:
+    lines = [
+        "# HELP http_request_duration_seconds Request latency by route.",
+        "# TYPE http_request_duration_seconds histogram",
+    ]
+    for (method, route), metrics in sorted(_routes.items()):
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS + ('+Inf',), metrics.buckets):
+            cumulative += count
+            lines.append(f'http_request_duration_seconds_bucket{{{_labels(method, route, le=bound)}}} {cumulative}')
+        lines.append(f'http_request_duration_seconds_sum{{{_labels(method, route)}}} {metrics.seconds}')
+        lines.append(f'http_request_duration_seconds_count{{{_labels(method, route)}}} {metrics.count}')
+    lines += ["# HELP http_requests_total Requests by route and status.", "# TYPE http_requests_total counter"]
+    for (method, route), metrics in sorted(_routes.items()):
+        for status, count in sorted(metrics.statuses.items()):
+            lines.append(f'http_requests_total{{{_labels(method, route, status=status)}}} {count}')
+    lines += ["# HELP mongo_commands_total MongoDB commands issued by route.", "# TYPE mongo_commands_total counter"]
+    for (method, route), metrics in sorted(_routes.items()):
+        lines.append(f'mongo_commands_total{{{_labels(method, route)}}} {metrics.commands}')
+    lines += ["# HELP mongo_command_seconds_total Time spent in MongoDB commands by route.",
+              "# TYPE mongo_command_seconds_total counter"]
+    for (method, route), metrics in sorted(_routes.items()):
+        lines.append(f'mongo_command_seconds_total{{{_labels(method, route)}}} {metrics.db_seconds}')
+    return "\n".join(lines) + "\n"
+
+# =============================
+# ASGI middleware: Server-Timing headers, route metrics and the slow-request log
+# =============================
+def server_timing(stats: RequestStats, total_seconds: float) -> bytes:
+    parts = [f'db;dur={stats.db_seconds * 1000:.2f};desc="{stats.commands} commands"']
+    if stats.slowest is not None:
+        parts.append(f'db-slowest;dur={stats.slowest_seconds * 1000:.2f};desc="{stats.slowest[0]}"')
+    parts.append(f'serialize;dur={stats.serialize_seconds * 1000:.2f}')
+    parts.append(f'app;dur={total_seconds * 1000:.2f}')
+    return ", ".join(parts).encode()
+
+def log_slow_request(method: str, path: str, seconds: float, stats: RequestStats):
+    print(f"[SLOW] {method} {path} {seconds * 1000:.1f} ms: {stats.commands} commands, "
+          f"{stats.db_seconds * 1000:.1f} ms in MongoDB, {stats.serialize_seconds * 1000:.1f} ms serializing")
+    if stats.slowest is not None:
+        name, command = stats.slowest
+        text = json_util.dumps(command) if command is not None else name
+        if len(text) > MAX_COMMAND_CHARS:
+            text = text[:MAX_COMMAND_CHARS] + "..."
+        print(f"[SLOW]   slowest {name} ({stats.slowest_seconds * 1000:.1f} ms): {text}")
+
+class MetricsMiddleware:
+    def __init__(self, app, slow_request_ms: float = SLOW_REQUEST_MS):
+        self.app = app
+        self.slow_request_ms = slow_request_ms
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", server_timing(stats, time.perf_counter() - started)))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            seconds = time.perf_counter() - started
+            _current.reset(token)
+            route = scope.get("route")
+            # Route templates (/orders/{order_id}) keep label cardinality bounded
+            template = getattr(route, "path", None) or "unmatched"
+            key = (scope["method"], template)
+            metrics = _routes.get(key)
+            if metrics is None:
+                metrics = _routes[key] = RouteMetrics()
+            metrics.observe(seconds, status, stats)
+            if seconds * 1000 >= self.slow_request_ms:
+                log_slow_request(scope["method"], scope["path"], seconds, stats)
@@ -0,0 +1,178 @@
+from datetime import datetime, timedelta
+from contextlib import nullcontext
+from pymongo import UpdateOne
+from utils.ids import to_object_id
+
+# Daily per-product sales buckets; products also carry an all-time `totalSold` counter.
+# Buckets denormalize the product's category and name so windowed per-category rollups
+# never need to join back to products.
+SALES_COLLECTION = 'product_sales'
+WINDOW_DAYS = 30
+
+# Truncate a datetime to the start of its (UTC) day
+def day_bucket(dt: datetime) -> datetime:
+    return datetime(dt.year, dt.month, dt.day)
+
+# Build the bulk operations that record one order's items in the popularity counters
+def build_sales_updates(order, products):
+    """Return (product_ops, bucket_ops) for the products and product_sales collections.
+
+    products maps product _id -> document with at least name and category.
+    """
+    day = day_bucket(order.get('createdAt') or datetime.utcnow())
+    sold = {}
+    for item in order.get('items', []):
+        if not item.get('product'):
+            continue
+        product_id = to_object_id(item['product'])
+        sold[product_id] = sold.get(product_id, 0) + item.get('quantity', 1)
+
+    product_ops = [
+        UpdateOne({"_id": product_id}, {"$inc": {"totalSold": quantity}, "$currentDate": {"updatedAt": True}})
+        for product_id, quantity in sold.items()
+    ]
+    bucket_ops = [
+        UpdateOne(
+            {"product": product_id, "day": day},
+            {"$inc": {"sold": quantity}, "$set": bucket_details(products.get(product_id))},
+            upsert=True
+        )
+        for product_id, quantity in sold.items()
+    ]
+    return product_ops, bucket_ops
+
+# Denormalized product fields stored on each bucket
+def bucket_details(product):
+    product = product or {}
+    return {"category": product.get('category'), "name": product.get('name')}
+
+# Incrementally apply an order that was just written
+def record_order_sales(db, order, products):
+    product_ops, bucket_ops = build_sales_updates(order, products)
+    if product_ops:
+        db['products'].bulk_write(product_ops, ordered=False)
+        db[SALES_COLLECTION].bulk_write(bucket_ops, ordered=False)
+
+# Rebuild all counters and buckets from the orders collection.
+# Orders, buckets and totals are read from one snapshot (replica set or sharded cluster) and
+# each counter is corrected with an $inc of (recomputed - snapshot), so orders written while the
+# rebuild runs keep their own increments. A standalone mongod has no snapshot reads: run it
+# there without concurrent orders.
+def rebuild_popularity(db, batch_size: int = 1000):
+    hello = db.command('hello')
+    snapshot = bool(hello.get('setName') or hello.get('msg') == 'isdbgrid')
+    if not snapshot:
+        print("[WARN] Standalone mongod: no snapshot reads, orders placed during the rebuild may be miscounted")
+
+    pipeline = [
+        {"$unwind": "$items"},
+        {"$group": {
+            "_id": {
+                "product": "$items.product",
+                "day": {"$dateTrunc": {"date": "$createdAt", "unit": "day"}}
+            },
+            "sold": {"$sum": "$items.quantity"}
+        }},
+        # Whole products per batch, so each batch is compared against that product's buckets
+        {"$sort": {"_id.product": 1}},
+        {"$lookup": {
+            "from": "products",
+            "localField": "_id.product",
+            "foreignField": "_id",
+            "pipeline": [{"$project": {"name": 1, "category": 1}}],
+            "as": "product"
+        }}
+    ]
+
+    seen = set()
+    with db.client.start_session(snapshot=True) if snapshot else nullcontext() as session:
+        batch = []
+        for bucket in db['orders'].aggregate(pipeline, allowDiskUse=True, session=session):
+            product_id = bucket['_id']['product']
+            if len(batch) >= batch_size and product_id != batch[-1]['_id']['product']:
+                _apply_sales_deltas(db, batch, session)
+                batch = []
+            batch.append(bucket)
+            seen.add(product_id)
+        if batch:
+            _apply_sales_deltas(db, batch, session)
+
+        # Products that had buckets or a totalSold but no orders any more
+        orphans = [product_id for product_id in db[SALES_COLLECTION].distinct('product', session=session)
+                   if product_id not in seen]
+        orphans += [product['_id'] for product in db['products'].find(
+            {"totalSold": {"$gt": 0}}, {"_id": 1}, session=session) if product['_id'] not in seen]
+        orphans = list(dict.fromkeys(orphans))
+        for i in range(0, len(orphans), batch_size):
+            _apply_sales_deltas(db, [], session, orphans[i:i + batch_size])
+
+    # Buckets the corrections brought to zero
+    db[SALES_COLLECTION].delete_many({"sold": {"$lte": 0}})
+    return {"products": len(seen)}
+
+# $inc buckets and totalSold of the batch's products (plus any extra_ids) from the snapshot
+# values to the recomputed ones
+def _apply_sales_deltas(db, buckets, session, extra_ids=()):
+    product_ids = list({bucket['_id']['product'] for bucket in buckets} | set(extra_ids))
+    current = {(doc['product'], doc['day']): doc.get('sold', 0) for doc in db[SALES_COLLECTION].find(
+        {"product": {"$in": product_ids}}, {"product": 1, "day": 1, "sold": 1}, session=session)}
+    totals = {doc['_id']: doc.get('totalSold') or 0 for doc in db['products'].find(
+        {"_id": {"$in": product_ids}}, {"totalSold": 1}, session=session)}
+
+    bucket_ops, recomputed = [], {}
+    for bucket in buckets:
+        product_id, day = bucket['_id']['product'], bucket['_id']['day']
+        recomputed[product_id] = recomputed.get(product_id, 0) + bucket['sold']
+        delta = bucket['sold'] - current.pop((product_id, day), 0)
+        product = bucket['product'][0] if bucket['product'] else None
+        bucket_ops.append(UpdateOne({"product": product_id, "day": day},
+                                    {"$inc": {"sold": delta}, "$set": bucket_details(product)}, upsert=True))
+    # Buckets no order backs any more
+    bucket_ops += [UpdateOne({"product": product_id, "day": day}, {"$inc": {"sold": -sold}})
+                   for (product_id, day), sold in current.items() if sold]
+    product_ops = [UpdateOne({"_id": product_id}, {"$inc": {"totalSold": recomputed.get(product_id, 0) - total},
+                                                   "$currentDate": {"updatedAt": True}})
+                   for product_id, total in totals.items() if recomputed.get(product_id, 0) != total]
+    if bucket_ops:
+        db[SALES_COLLECTION].bulk_write(bucket_ops, ordered=False)
+    if product_ops:
+        db['products'].bulk_write(product_ops, ordered=False)
+
+# Start of the rolling popularity window
+def window_start(days: int = WINDOW_DAYS) -> datetime:
+    return day_bucket(datetime.utcnow()) - timedelta(days=days)
+
+# Top N most purchased products per category over the last `days` days, merged from the
+# daily buckets (optionally only some categories); orders are never scanned
+def build_top_products_pipeline(days: int, limit: int, categories=None):
+    match = {"day": {"$gte": window_start(days)}}
+    if categories is not None:
+        match["category"] = {"$in": list(categories)}
+    return [
+        {"$match": match},
+        {
+            "$group": {
+                "_id": "$product",
+                "category": {"$last": "$category"},
+                "name": {"$last": "$name"},
+                "totalSold": {"$sum": "$sold"}
+            }
+        },
+        {"$match": {"category": {"$ne": None}}},
+        {
+            "$group": {
+                "_id": "$category",
+                "topProducts": {
+                    "$topN": {
+                        "n": limit,
+                        "sortBy": {"totalSold": -1, "_id": 1},
+                        "output": {
+                            "name": "$name",
+                            "sold": "$totalSold"
+                        }
+                    }
+                }
+            }
+        },
+        {"$sort": {"_id": 1}}
+    ]
@@ -0,0 +1,35 @@
+import asyncio
+from configure.context import current_context, get_async_db
+from services.product_summaries import fetch_by_ids
+
+# Fields embedded when an order reference is populated (products: services/product_summaries.py)
+USER_SUMMARY_PROJECTION = {"name": 1, "email": 1}
+
+# Populate items.product (and optionally user) across a list of orders in place
+async def populate_orders(orders, populate_user: bool = False):
+    """Replace product/user references with summaries; at most one query per collection regardless of size"""
+    db = get_async_db(read_only=True)
+
+    product_ids = {
+        item['product']
+        for order in orders
+        for item in order.get('items', [])
+        if item.get('product')
+    }
+    user_ids = {order['user'] for order in orders if order.get('user')} if populate_user else set()
+
+    # Products and users are independent lookups, so they run concurrently; products come from
+    # the summary cache, which queries only the ids it does not hold
+    products, users = await asyncio.gather(
+        current_context().product_summaries.get_many(db['products'], product_ids),
+        fetch_by_ids(db['users'], user_ids, USER_SUMMARY_PROJECTION)
+    )
+
+    for order in orders:
+        if populate_user and order.get('user') in users:
+            order['user'] = users[order['user']]
+        for item in order.get('items', []):
+            product = products.get(item.get('product'))
+            if product:
+                item['product'] = product
+    return orders
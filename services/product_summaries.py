@@ -0,0 +1,112 @@
+import time
+from collections import OrderedDict
+from bson import ObjectId
+from bson.errors import InvalidId
+from services.cache import product_tag
+
+# Fields embedded when an order reference is populated
+PRODUCT_SUMMARY_PROJECTION = {"name": 1, "brand": 1, "price": 1}
+
+# Fetch every document with an _id in ids using one $in query, keyed by _id
+async def fetch_by_ids(collection, ids, projection=None):
+    if not ids:
+        return {}
+    docs = await collection.find({"_id": {"$in": list(ids)}}, projection).to_list()
+    return {doc['_id']: doc for doc in docs}
+
+# =============================
+# Product summaries: read-through LRU, one per application (configure/context.py)
+# =============================
+class ProductSummary:
+    """One cached summary; __slots__ keeps ~10k entries to a few MB"""
+
+    __slots__ = ('_id', 'name', 'brand', 'price', 'expires_at')
+
+    def __init__(self, doc: dict, expires_at: float):
+        self._id = doc['_id']
+        self.name = doc.get('name')
+        self.brand = doc.get('brand')
+        self.price = doc.get('price')
+        self.expires_at = expires_at
+
+    # A fresh dict per call, as populated orders are modified by the caller
+    def as_dict(self) -> dict:
+        doc = {"_id": self._id}
+        for field in PRODUCT_SUMMARY_PROJECTION:
+            value = getattr(self, field)
+            if value is not None:
+                doc[field] = value
+        return doc
+
+
+class ProductSummaryCache:
+    """Bounded LRU of product summaries; get_many queries MongoDB only for the ids it lacks.
+
+    Entries are dropped whenever the response cache invalidates a product's tag (in this
+    worker or, with a shared backend, any other); the TTL bounds staleness after writes
+    made outside the API (import_catalog.py, seed.py).
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()   # ObjectId -> ProductSummary
+        self._generation = 0            # bumped on invalidation so in-flight loads are not stored
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    async def get_many(self, collection, ids) -> dict:
+        """Summaries keyed by _id; unknown ids are absent from the result"""
+        now = time.monotonic()
+        found, missing = {}, []
+        for product_id in ids:
+            entry = self._entries.get(product_id)
+            if entry is not None and entry.expires_at > now:
+                self._entries.move_to_end(product_id)
+                found[product_id] = entry.as_dict()
+            else:
+                missing.append(product_id)
+        self.stats["hits"] += len(found)
+        self.stats["misses"] += len(missing)
+        if not missing or self.max_entries <= 0 or self.ttl <= 0:
+            found.update(await fetch_by_ids(collection, missing, PRODUCT_SUMMARY_PROJECTION))
+            return found
+
+        generation = self._generation
+        docs = await fetch_by_ids(collection, missing, PRODUCT_SUMMARY_PROJECTION)
+        # Skip storing summaries that may predate an invalidation issued while they loaded
+        if generation == self._generation:
+            expires_at = time.monotonic() + self.ttl
+            for product_id, doc in docs.items():
+                self._entries[product_id] = ProductSummary(doc, expires_at)
+                self._entries.move_to_end(product_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+        found.update(docs)
+        return found
+
+    def invalidate(self, *product_ids):
+        self._generation += 1
+        for product_id in product_ids:
+            if self._entries.pop(product_id, None) is not None:
+                self.stats["invalidations"] += 1
+
+    def clear(self):
+        self._generation += 1
+        self._entries.clear()
+
+    # Cache.subscribe callback: product:<id> tags name the products that changed
+    def on_invalidation(self, tags):
+        prefix = product_tag('')
+        product_ids = []
+        for tag in tags:
+            if tag.startswith(prefix):
+                try:
+                    product_ids.append(ObjectId(tag[len(prefix):]))
+                except InvalidId:
+                    continue
+        if product_ids:
+            self.invalidate(*product_ids)
+
+    def snapshot(self):
+        return {**self.stats, "entries": len(self._entries), "maxEntries": self.max_entries}
@@ -0,0 +1,59 @@
+from typing import NamedTuple
+from fastapi import HTTPException
+
+# finalScore = similarity * w1 + popularity * w2 + price closeness * w3
+class RankWeights(NamedTuple):
+    similarity: float = 0.4
+    popularity: float = 0.4
+    price: float = 0.2
+
+# "0.5,0.3,0.2" -> RankWeights; None/empty -> default
+def parse_weights(text: str = None, default: RankWeights = None) -> RankWeights:
+    if not text:
+        return default or RankWeights()
+    try:
+        values = [float(part) for part in text.split(',')]
+    except ValueError:
+        values = []
+    if len(values) != 3 or any(value < 0 for value in values) or not sum(values):
+        raise HTTPException(status_code=400,
+                            detail="weights must be three non-negative numbers: similarity,popularity,price")
+    return RankWeights(*values)
+
+# Built-in default; each application's SEARCH_WEIGHTS (e.g. 0.5,0.3,0.2) is on its context
+DEFAULT_WEIGHTS = RankWeights()
+
+# =============================
+# Vectorized scoring over the whole candidate set
+# =============================
+def score(sim, popularity, price, budget: float = None, weights: RankWeights = DEFAULT_WEIGHTS):
+    """Return (pop_score, final) arrays; sim, popularity and price are aligned arrays"""
+    # numpy is optional and only loaded by callers that rank in-process (in-memory engine, benchmarks)
+    import numpy as np
+    max_pop = popularity.max() if len(popularity) else 0
+    pop_score = popularity / max_pop if max_pop > 0 else np.zeros(len(popularity))
+    price_score = 1 - np.abs(price - budget) / max(budget, 1) if budget else 1
+    final = weights.similarity * sim + weights.popularity * pop_score + weights.price * price_score
+    return pop_score, final
+
+# =============================
+# Partial selection: order only the rows that can appear on the requested page
+# =============================
+def top_k(values, direction: int, tie_rank, k: int, offset: int = 0):
+    """Indices of rows offset..offset+k in (values by direction, tie_rank ascending) order.
+
+    argpartition finds the boundary value of the first offset+k rows in O(n); only rows at or
+    before that boundary (ties included) are fully sorted.
+    """
+    import numpy as np
+    needed = offset + k
+    if needed <= 0 or not len(values):
+        return np.empty(0, dtype=np.int64)
+    keys = values * direction
+    if needed < len(keys):
+        boundary = keys[np.argpartition(keys, needed - 1)[needed - 1]]
+        candidates = np.flatnonzero(keys <= boundary)
+    else:
+        candidates = np.arange(len(keys))
+    order = candidates[np.lexsort((tie_rank[candidates], keys[candidates]))]
+    return order[offset:needed]
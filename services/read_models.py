@@ -0,0 +1,255 @@
+import time
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo import UpdateOne, ReplaceOne
+from pymongo.errors import OperationFailure
+from utils.ids import to_object_id
+from services.popularity import (SALES_COLLECTION, WINDOW_DAYS, bucket_details, day_bucket,
+                                 build_top_products_pipeline, rebuild_popularity)
+
+# Materialized per-category top sellers for the default window, served by /orders/top-products
+TOP_PRODUCTS_COLLECTION = 'category_top_products'
+TOP_PRODUCTS_LIMIT = 50          # longest list kept per category (the endpoint's maximum limit)
+TOP_PRODUCTS_MAX_AGE = timedelta(hours=2)
+# Full refresh of the materialized top sellers, as the window slides even without new orders
+TOP_PRODUCTS_REFRESH_SECONDS = 3600
+# Resume tokens / polling positions of the worker
+CHECKPOINTS_COLLECTION = 'event_checkpoints'
+WATCHED = ('orders', 'reviews')
+# ObjectIds are generated by the client (orders get theirs before the stock writes), so concurrent
+# writes can commit out of _id order; the poller rescans this trailing window for ids it missed
+POLL_OVERLAP = timedelta(seconds=30)
+
+# =============================
+# Idempotent refreshes: every derived field is recomputed from its source and $set,
+# so replaying an event (after a crash, or in the polling overlap) never double counts
+# =============================
+def refresh_user_totals(db, user_ids):
+    if not user_ids:
+        return 0
+    totals = {doc['_id']: doc for doc in db['orders'].aggregate([
+        {"$match": {"user": {"$in": list(user_ids)}}},
+        {"$group": {"_id": "$user", "totalSpent": {"$sum": "$totalCost"}, "purchaseCount": {"$sum": 1}}}
+    ])}
+    ops = [UpdateOne({"_id": user_id}, {"$set": {
+        "totalSpent": round(totals.get(user_id, {}).get('totalSpent', 0.0), 2),
+        "purchaseCount": totals.get(user_id, {}).get('purchaseCount', 0)
+    }}) for user_id in user_ids]
+    db['users'].bulk_write(ops, ordered=False)
+    return len(ops)
+
+def refresh_product_ratings(db, product_ids):
+    if not product_ids:
+        return 0
+    ratings = {doc['_id']: doc for doc in db['reviews'].aggregate([
+        {"$match": {"product": {"$in": list(product_ids)}}},
+        {"$group": {"_id": "$product", "ratingSum": {"$sum": "$rating"}, "ratingCount": {"$sum": 1}}}
+    ])}
+    ops = []
+    for product_id in product_ids:
+        found = ratings.get(product_id, {})
+        count = found.get('ratingCount', 0)
+        total = found.get('ratingSum', 0)
+        ops.append(UpdateOne({"_id": product_id}, {
+            "$set": {"ratingSum": total, "ratingCount": count, "rating": total / count if count else 0.0},
+            "$currentDate": {"updatedAt": True}
+        }))
+    db['products'].bulk_write(ops, ordered=False)
+    return len(ops)
+
+# Recount the touched (product, day) buckets from orders, then products.totalSold from the buckets
+def refresh_product_sales(db, pairs):
+    if not pairs:
+        return set()
+    product_ids = list({product_id for product_id, _ in pairs})
+    days = [day for _, day in pairs]
+    sold = {(doc['_id']['product'], doc['_id']['day']): doc['sold'] for doc in db['orders'].aggregate([
+        {"$match": {"items.product": {"$in": product_ids},
+                    "createdAt": {"$gte": min(days), "$lt": max(days) + timedelta(days=1)}}},
+        {"$unwind": "$items"},
+        {"$match": {"items.product": {"$in": product_ids}}},
+        {"$group": {
+            "_id": {"product": "$items.product",
+                    "day": {"$dateTrunc": {"date": "$createdAt", "unit": "day"}}},
+            "sold": {"$sum": "$items.quantity"}
+        }}
+    ])}
+    products = {doc['_id']: doc for doc in db['products'].find({"_id": {"$in": product_ids}},
+                                                                {"name": 1, "category": 1})}
+    db[SALES_COLLECTION].bulk_write([
+        UpdateOne({"product": product_id, "day": day},
+                  {"$set": {"sold": sold.get((product_id, day), 0), **bucket_details(products.get(product_id))}},
+                  upsert=True)
+        for product_id, day in pairs
+    ], ordered=False)
+
+    totals = {doc['_id']: doc['sold'] for doc in db[SALES_COLLECTION].aggregate([
+        {"$match": {"product": {"$in": product_ids}}},
+        {"$group": {"_id": "$product", "sold": {"$sum": "$sold"}}}
+    ])}
+    db['products'].bulk_write([
+        UpdateOne({"_id": product_id}, {"$set": {"totalSold": totals.get(product_id, 0)},
+                                        "$currentDate": {"updatedAt": True}})
+        for product_id in product_ids
+    ], ordered=False)
+    return {doc.get('category') for doc in products.values() if doc.get('category')}
+
+# Rebuild the materialized top sellers of some categories (all when categories is None)
+def refresh_category_top_products(db, categories=None):
+    if categories is not None and not categories:
+        return 0
+    now = datetime.utcnow()
+    pipeline = build_top_products_pipeline(WINDOW_DAYS, TOP_PRODUCTS_LIMIT, categories)
+    docs = list(db[SALES_COLLECTION].aggregate(pipeline))
+    collection = db[TOP_PRODUCTS_COLLECTION]
+    if docs:
+        collection.bulk_write([ReplaceOne({"_id": doc['_id']}, {**doc, "refreshedAt": now}, upsert=True)
+                               for doc in docs], ordered=False)
+    # Categories with no sales left in the window
+    found = [doc['_id'] for doc in docs]
+    stale = {"_id": {"$nin": found}}
+    if categories is not None:
+        stale = {"_id": {"$in": [c for c in categories if c not in found]}}
+    collection.delete_many(stale)
+    return len(docs)
+
+# Everything, from scratch (first start, or after the worker was down for a long time)
+def reconcile_all(db, batch_size: int = 1000):
+    rebuild_popularity(db, batch_size)
+    user_ids = db['users'].distinct('_id')
+    for i in range(0, len(user_ids), batch_size):
+        refresh_user_totals(db, user_ids[i:i + batch_size])
+    product_ids = db['products'].distinct('_id')
+    for i in range(0, len(product_ids), batch_size):
+        refresh_product_ratings(db, product_ids[i:i + batch_size])
+    refresh_category_top_products(db)
+    return {"users": len(user_ids), "products": len(product_ids)}
+
+# =============================
+# Events -> affected keys -> one batched refresh
+# =============================
+class Affected:
+    def __init__(self):
+        self.users = set()
+        self.rated_products = set()
+        self.sales = set()        # (product, day)
+
+    def __bool__(self):
+        return bool(self.users or self.rated_products or self.sales)
+
+    def add(self, collection: str, doc):
+        if not doc:
+            return
+        if collection == 'orders':
+            if doc.get('user'):
+                self.users.add(to_object_id(doc['user']))
+            day = day_bucket(doc.get('createdAt') or datetime.utcnow())
+            for item in doc.get('items', []):
+                if item.get('product'):
+                    self.sales.add((to_object_id(item['product']), day))
+        elif collection == 'reviews' and doc.get('product'):
+            self.rated_products.add(to_object_id(doc['product']))
+
+def apply(db, affected: Affected) -> dict:
+    categories = refresh_product_sales(db, affected.sales)
+    return {
+        "users": refresh_user_totals(db, affected.users),
+        "ratings": refresh_product_ratings(db, affected.rated_products),
+        "sales": len(affected.sales),
+        "categories": refresh_category_top_products(db, categories),
+    }
+
+# Fields the refreshes need from each event's document
+EVENT_PROJECTION = {"user": 1, "items.product": 1, "items.quantity": 1, "createdAt": 1, "product": 1}
+
+def load_checkpoint(db, name: str) -> dict:
+    return db[CHECKPOINTS_COLLECTION].find_one({"_id": name}) or {}
+
+def save_checkpoint(db, name: str, **fields):
+    db[CHECKPOINTS_COLLECTION].update_one({"_id": name}, {"$set": {**fields, "updatedAt": datetime.utcnow()}},
+                                          upsert=True)
+
+# =============================
+# Sources: change streams (replica set / sharded) or polling (standalone mongod)
+# =============================
+def tail_change_stream(db, on_batch, batch_size: int = 500, max_wait_ms: int = 1000):
+    """Raises OperationFailure on a standalone server (no change streams)."""
+    pipeline = [{"$match": {"ns.coll": {"$in": list(WATCHED)},
+                            "operationType": {"$in": ["insert", "replace", "update"]}}}]
+    token = load_checkpoint(db, 'change_stream').get('token')
+    with db.watch(pipeline, full_document='updateLookup', resume_after=token,
+                  max_await_time_ms=max_wait_ms) as stream:
+        print(f"[OK] Tailing change streams on {', '.join(WATCHED)}" + (" (resumed)" if token else ""))
+        while stream.alive:
+            affected, events = Affected(), 0
+            while events < batch_size:
+                change = stream.try_next()
+                if change is None:
+                    break
+                affected.add(change['ns']['coll'], change.get('fullDocument'))
+                events += 1
+            on_batch(affected, events)
+            # The token is saved only after the batch is applied, so a crash replays it
+            if stream.resume_token is not None:
+                save_checkpoint(db, 'change_stream', token=stream.resume_token)
+
+def poll(db, on_batch, batch_size: int = 500, interval: float = 2.0):
+    """Fallback without change streams: new orders/reviews by ascending _id, rescanning the last
+    POLL_OVERLAP before the newest _id seen so late commits are not skipped."""
+    latest = {name: load_checkpoint(db, f"poll:{name}").get('lastId') for name in WATCHED}
+    seen = {name: set() for name in WATCHED}   # ids applied inside the current window
+    print(f"[OK] Polling {', '.join(WATCHED)} every {interval}s")
+    while True:
+        found = 0
+        for name in WATCHED:
+            query = {}
+            if latest[name]:
+                floor = ObjectId.from_datetime(latest[name].generation_time - POLL_OVERLAP)
+                query = {"_id": {"$gte": floor}}
+                seen[name] = {seen_id for seen_id in seen[name] if seen_id >= floor}
+            # Walk the window's ids (the _id index alone) and stop at batch_size unseen ones
+            new_ids = []
+            cursor = db[name].find(query, {"_id": 1}).sort('_id', 1)
+            for doc in cursor:
+                if doc['_id'] not in seen[name]:
+                    new_ids.append(doc['_id'])
+                    if len(new_ids) == batch_size:
+                        break
+            cursor.close()
+            if not new_ids:
+                on_batch(Affected(), 0)
+                continue
+            affected = Affected()
+            for doc in db[name].find({"_id": {"$in": new_ids}}, EVENT_PROJECTION):
+                affected.add(name, doc)
+            on_batch(affected, len(new_ids))
+            seen[name].update(new_ids)
+            latest[name] = max(new_ids[-1], latest[name]) if latest[name] else new_ids[-1]
+            save_checkpoint(db, f"poll:{name}", lastId=latest[name])
+            found += len(new_ids)
+        if found < batch_size:
+            time.sleep(interval)
+
+def run_worker(db, batch_size: int = 500, interval: float = 2.0, force_poll: bool = False):
+    refreshed_at = 0.0
+
+    # Called after every read from the source, with or without events
+    def on_batch(affected, events):
+        nonlocal refreshed_at
+        if affected:
+            result = apply(db, affected)
+            print(f"[OK] {events} events: {result['users']} users, {result['ratings']} ratings, "
+                  f"{result['sales']} sales buckets, {result['categories']} categories refreshed")
+        if time.monotonic() - refreshed_at >= TOP_PRODUCTS_REFRESH_SECONDS:
+            refresh_category_top_products(db)
+            refreshed_at = time.monotonic()
+
+    if not force_poll:
+        try:
+            return tail_change_stream(db, on_batch, batch_size)
+        except OperationFailure as err:
+            # 40573: $changeStream is only supported on replica sets
+            if err.code != 40573:
+                raise
+            print("[SKIP] Change streams unavailable (standalone mongod); falling back to polling")
+    return poll(db, on_batch, batch_size, interval)
@@ -0,0 +1,353 @@
+import re
+import math
+import time
+import bisect
+import asyncio
+from datetime import timedelta
+from collections import Counter
+from services import ranking, facets
+
+# numpy (optional) is imported when an engine is created, i.e. only with SEARCH_ENGINE=memory:
+# it is the largest import of the API and the default $text search never needs it
+np = None
+
+def import_numpy():
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:
+            raise RuntimeError("SEARCH_ENGINE=memory requires numpy (pip install numpy)")
+        np = numpy
+    return np
+
+# Product fields held by the engine: text columns (changes force an index rebuild)
+# and numeric columns (updated in place)
+TEXT_FIELDS = ('name', 'description', 'brand', 'category')
+OBJECT_FIELDS = ('createdAt',)
+NUMERIC_FIELDS = {'price': 'float64', 'totalSold': 'float64', 'stock': 'int64',
+                  'rating': 'float64', 'ratingCount': 'int64'}
+LOAD_PROJECTION = {field: 1 for field in (*TEXT_FIELDS, *OBJECT_FIELDS, *NUMERIC_FIELDS, 'updatedAt')}
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+# updatedAt is stamped before a write commits (transactions, review and order writes), so a
+# product can appear stamped earlier than synced_at; every delta sync rescans this window
+SYNC_OVERLAP = timedelta(seconds=30)
+# A typeahead prefix expands to at most this many indexed terms (most frequent first)
+MAX_PREFIX_TERMS = 64
+
+TOKEN = re.compile(r"[a-z0-9]+")
+STOP_WORDS = frozenset("a an and are as at be by for from in is it of on or the to with".split())
+
+def tokenize(text) -> list:
+    return [token for token in TOKEN.findall(str(text or '').lower()) if token not in STOP_WORDS]
+
+# =============================
+# Snapshot: immutable text index plus columns; numeric columns are updated in place
+# =============================
+class SearchSnapshot:
+    def __init__(self, rows):
+        n = len(rows)
+        self.size = n
+        self.ids = [row['_id'] for row in rows]
+        self.positions = {product_id: i for i, product_id in enumerate(self.ids)}
+        self.id_hex = np.array([str(product_id) for product_id in self.ids], dtype='U24')
+        # ObjectIds sort like their hex strings; the rank gives an integer tie-breaker for lexsort
+        self.id_rank = np.empty(n, dtype=np.int64)
+        self.id_rank[np.argsort(self.id_hex, kind='stable')] = np.arange(n)
+
+        self.objects = {field: [row.get(field) for row in rows] for field in (*TEXT_FIELDS, *OBJECT_FIELDS)}
+        self.numbers = {field: np.array([row.get(field) or 0 for row in rows], dtype=dtype)
+                        for field, dtype in NUMERIC_FIELDS.items()}
+
+        # Category bitmaps
+        self.category_masks = {}
+        for i, category in enumerate(self.objects['category']):
+            if category is not None:
+                if category not in self.category_masks:
+                    self.category_masks[category] = np.zeros(n, dtype=bool)
+                self.category_masks[category][i] = True
+
+        # Dictionary-encoded category and brand (-1 = missing) for facet counts
+        self.codes = {}
+        for field in ('category', 'brand'):
+            values = sorted({value for value in self.objects[field] if value is not None}, key=str)
+            lookup = {value: code for code, value in enumerate(values)}
+            self.codes[field] = (values, np.array([lookup.get(value, -1) for value in self.objects[field]],
+                                                  dtype=np.int32))
+
+        # Inverted index: term -> (row numbers, precomputed BM25 weight per row)
+        postings = {}
+        lengths = np.zeros(n, dtype=np.float64)
+        for i, row in enumerate(rows):
+            tokens = tokenize(row.get('name')) + tokenize(row.get('description')) + tokenize(row.get('brand'))
+            lengths[i] = len(tokens)
+            for term, tf in Counter(tokens).items():
+                postings.setdefault(term, ([], []))
+                postings[term][0].append(i)
+                postings[term][1].append(tf)
+        avg_length = lengths.mean() if n else 0.0
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths / avg_length) if avg_length else np.ones(n)
+        self.postings = {}
+        for term, (docs, tfs) in postings.items():
+            docs = np.array(docs, dtype=np.int32)
+            tfs = np.array(tfs, dtype=np.float64)
+            idf = math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            self.postings[term] = (docs, (idf * tfs * (BM25_K1 + 1) / (tfs + norm[docs])).astype(np.float32))
+        self.terms = sorted(self.postings)
+
+    def row(self, i) -> dict:
+        row = {"_id": self.ids[i]}
+        for field, values in self.objects.items():
+            row[field] = values[i]
+        for field, values in self.numbers.items():
+            row[field] = values[i].item()
+        return row
+
+    def _prefix_terms(self, prefix: str) -> list:
+        start = bisect.bisect_left(self.terms, prefix)
+        end = bisect.bisect_left(self.terms, prefix + '\uffff')
+        terms = self.terms[start:end]
+        if len(terms) > MAX_PREFIX_TERMS:
+            terms = sorted(terms, key=lambda term: -len(self.postings[term][0]))[:MAX_PREFIX_TERMS]
+        return terms
+
+    # Per-value counts of a dictionary-encoded column over some rows
+    def value_counts(self, field: str, rows) -> dict:
+        values, codes = self.codes[field]
+        codes = codes[rows]
+        counts = np.bincount(codes[codes >= 0], minlength=len(values))
+        return {values[code]: int(counts[code]) for code in np.flatnonzero(counts)}
+
+    # Counts per histogram bucket; bounds are lower bounds, the last bucket is open-ended
+    @staticmethod
+    def bucket_counts(column, bounds) -> dict:
+        buckets = np.searchsorted(bounds, column, side='right') - 1
+        counts = np.bincount(buckets[buckets >= 0], minlength=len(bounds))
+        return {bounds[i]: int(counts[i]) for i in np.flatnonzero(counts)}
+
+    # OR-match the query; the last token is a prefix (typeahead). Returns (rows, BM25 scores).
+    def match(self, query: str):
+        tokens = tokenize(query)
+        parts_docs, parts_scores = [], []
+        for position, token in enumerate(tokens):
+            terms = self._prefix_terms(token) if position == len(tokens) - 1 else [token]
+            found = [self.postings[term] for term in terms if term in self.postings]
+            if not found:
+                continue
+            docs = np.concatenate([docs for docs, _ in found])
+            scores = np.concatenate([scores for _, scores in found])
+            if len(found) > 1:
+                # A document matching several expansions of one prefix counts its best one
+                docs, inverse = np.unique(docs, return_inverse=True)
+                best = np.zeros(len(docs), dtype=np.float32)
+                np.maximum.at(best, inverse, scores)
+                scores = best
+            parts_docs.append(docs)
+            parts_scores.append(scores)
+        if not parts_docs:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+        # Dense accumulation over all rows: one bincount instead of sorting the postings
+        scores = np.bincount(np.concatenate(parts_docs), weights=np.concatenate(parts_scores),
+                             minlength=self.size)
+        docs = np.flatnonzero(scores)
+        return docs, scores[docs]
+
+# =============================
+# Engine: query API plus loading and delta sync from MongoDB
+# =============================
+class InMemorySearch:
+    """Optional in-process product search; load_search_page uses it once it is ready"""
+
+    def __init__(self, sync_seconds: float = 5, reload_seconds: float = 3600):
+        import_numpy()
+        self.sync_seconds = sync_seconds
+        self.reload_seconds = reload_seconds
+        self.snapshot = None
+        self.synced_at = None        # largest updatedAt seen (server clock)
+        self._applied = {}           # _id -> updatedAt applied, for products inside the overlap window
+        self.loaded_at = 0.0
+        self._task = None
+        self.stats = {"products": 0, "terms": 0, "syncs": 0, "updated": 0, "rebuilds": 0, "errors": 0}
+
+    @property
+    def ready(self) -> bool:
+        return self.snapshot is not None
+
+    # Candidate rows after the text match and filters, with their scoring inputs
+    def search(self, query: str, min_price: float, max_price: float, category: str,
+               skip: int, limit: int, sort_fields, budget: float, after=None, fields=None,
+               weights: ranking.RankWeights = ranking.DEFAULT_WEIGHTS, facets: bool = False):
+        """Return (total, rows, facet counts) with up to limit + 1 rows in sort order.
+
+        after holds the decoded cursor values; rows carry `fields` plus the sort keys.
+        Facet counts (None unless requested) are raw counts for services.facets.format_facets.
+        """
+        snapshot = self.snapshot
+        if query:
+            docs, bm25 = snapshot.match(query)
+        else:
+            docs, bm25 = np.arange(snapshot.size), None
+
+        price = snapshot.numbers['price'][docs]
+        in_price = np.ones(len(docs), dtype=bool)
+        if min_price is not None:
+            in_price &= price >= min_price
+        if max_price is not None:
+            in_price &= price <= max_price
+        in_category = np.ones(len(docs), dtype=bool)
+        if category is not None:
+            mask = snapshot.category_masks.get(category)
+            in_category &= mask[docs] if mask is not None else False
+        keep = in_price & in_category
+        counts = self.facet_counts(docs, price, keep, in_price, in_category) if facets else None
+        docs, price = docs[keep], price[keep]
+        if bm25 is not None:
+            bm25 = bm25[keep]
+        total = len(docs)
+
+        popularity = snapshot.numbers['totalSold'][docs]
+        sim = bm25 / bm25.max() if bm25 is not None and total and bm25.max() > 0 else np.full(total, 0.5)
+        _, final = ranking.score(sim, popularity, price, budget, weights)
+
+        keys = {"finalScore": final, "price": price, "popularity": popularity}
+        (primary, direction), _ = sort_fields
+        values = keys[primary]
+        if after is not None:
+            value, last_id = after
+            beyond = values > value if direction == 1 else values < value
+            ties = np.flatnonzero(values == value)
+            beyond[ties] = snapshot.id_hex[docs[ties]] > str(last_id)
+            selected = np.flatnonzero(beyond)
+            order = selected[ranking.top_k(values[selected], direction, snapshot.id_rank[docs[selected]],
+                                           limit + 1)]
+        else:
+            order = ranking.top_k(values, direction, snapshot.id_rank[docs], limit + 1, skip)
+
+        columns = {"score": bm25, "popularity": popularity, "simScore": sim, "finalScore": final}
+        wanted = list(fields) + ([primary] if primary not in fields else [])
+        rows = []
+        for i in order:
+            row_number = docs[i]
+            doc = {"_id": snapshot.ids[row_number]}
+            for field in wanted:
+                if field in snapshot.objects:
+                    doc[field] = snapshot.objects[field][row_number]
+                elif field in snapshot.numbers and field != 'totalSold':
+                    doc[field] = snapshot.numbers[field][row_number].item()
+                elif field in columns and columns[field] is not None:
+                    value = columns[field][i]
+                    doc[field] = int(value) if field == 'popularity' else float(value)
+            rows.append(doc)
+        return total, rows, counts
+
+    # Category/price counts ignore their own filter, brand/rating counts apply both (see services/facets.py)
+    def facet_counts(self, docs, price, keep, in_price, in_category) -> dict:
+        snapshot = self.snapshot
+        kept = docs[keep]
+        rating = np.floor(snapshot.numbers['rating'][kept])
+        return {
+            "categories": snapshot.value_counts('category', docs[in_price]),
+            "brands": snapshot.value_counts('brand', kept),
+            "price": snapshot.bucket_counts(price[in_category], facets.PRICE_BUCKETS),
+            "rating": snapshot.bucket_counts(np.minimum(rating, facets.RATING_BUCKETS - 1),
+                                             list(range(facets.RATING_BUCKETS))),
+        }
+
+    # =============================
+    # Loading and sync
+    # =============================
+    async def load(self, collection):
+        rows = await collection.find({}, LOAD_PROJECTION).to_list()
+        self.snapshot = await asyncio.to_thread(SearchSnapshot, rows)
+        self.synced_at = None
+        self._applied = {}
+        self._mark_synced(rows)
+        self.loaded_at = time.monotonic()
+        self.stats.update(products=self.snapshot.size, terms=len(self.snapshot.terms))
+        self.stats["rebuilds"] += 1
+
+    # Apply products written since the last sync: numeric changes in place, anything else
+    # (new products, text or category changes) through a rebuild of the snapshot
+    async def sync(self, collection):
+        if self.synced_at is None:
+            return await self.load(collection)
+        # Rescan the trailing window and keep the versions not applied yet (applying one twice is harmless)
+        found = await collection.find({"updatedAt": {"$gte": self.synced_at - SYNC_OVERLAP}},
+                                      LOAD_PROJECTION).to_list()
+        changed = [doc for doc in found if self._applied.get(doc['_id']) != doc.get('updatedAt')]
+        self.stats["syncs"] += 1
+        if not changed:
+            return
+        snapshot = self.snapshot
+        structural = []
+        for doc in changed:
+            i = snapshot.positions.get(doc['_id'])
+            if i is None or any(doc.get(field) != snapshot.objects[field][i] for field in TEXT_FIELDS):
+                structural.append(doc)
+                continue
+            for field in NUMERIC_FIELDS:
+                snapshot.numbers[field][i] = doc.get(field) or 0
+            for field in OBJECT_FIELDS:
+                snapshot.objects[field][i] = doc.get(field)
+        if structural:
+            replaced = {doc['_id']: doc for doc in structural}
+            rows = [replaced.pop(product_id, None) or snapshot.row(i) for i, product_id in enumerate(snapshot.ids)]
+            rows += list(replaced.values())
+            self.snapshot = await asyncio.to_thread(SearchSnapshot, rows)
+            self.stats.update(products=self.snapshot.size, terms=len(self.snapshot.terms))
+            self.stats["rebuilds"] += 1
+        self._mark_synced(changed)
+        self.stats["updated"] += len(changed)
+
+    def _mark_synced(self, docs):
+        for doc in docs:
+            if doc.get('updatedAt'):
+                self._applied[doc['_id']] = doc['updatedAt']
+        stamps = [doc['updatedAt'] for doc in docs if doc.get('updatedAt')]
+        if stamps:
+            self.synced_at = max(stamps) if self.synced_at is None else max(self.synced_at, *stamps)
+        if self.synced_at is not None:
+            floor = self.synced_at - SYNC_OVERLAP
+            self._applied = {product_id: stamp for product_id, stamp in self._applied.items() if stamp >= floor}
+
+    async def _run(self, collection):
+        # Initial load in the background: search falls back to $text until the index is ready
+        try:
+            await self.load(collection)
+            print(f"[OK] In-memory search index: {self.stats['products']} products, {self.stats['terms']} terms")
+        except Exception as err:
+            self.stats["errors"] += 1
+            print(f"[WARN] Search index load failed (retried on the next sync): {err}")
+        while True:
+            await asyncio.sleep(self.sync_seconds)
+            try:
+                # A periodic full reload also drops deleted products
+                if time.monotonic() - self.loaded_at >= self.reload_seconds:
+                    await self.load(collection)
+                else:
+                    await self.sync(collection)
+            except Exception as err:
+                self.stats["errors"] += 1
+                print(f"[WARN] Search index sync failed: {err}")
+
+    async def start(self, collection):
+        self._task = asyncio.create_task(self._run(collection))
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+# SEARCH_ENGINE=memory serves /products/search from the in-process index; mongo (default) keeps $text
+def create_search_engine(settings):
+    if settings.search_engine != 'memory':
+        return None
+    return InMemorySearch(sync_seconds=settings.search_sync_seconds,
+                          reload_seconds=settings.search_reload_seconds)
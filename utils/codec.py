@@ -0,0 +1,27 @@
+from datetime import datetime
+import msgpack
+from bson import ObjectId
+
+# Compact binary encoding for cached values (msgpack with ObjectId/datetime extensions)
+EXT_OBJECTID = 1
+EXT_DATETIME = 2
+
+def _default(obj):
+    if isinstance(obj, ObjectId):
+        return msgpack.ExtType(EXT_OBJECTID, obj.binary)
+    if isinstance(obj, datetime):
+        return msgpack.ExtType(EXT_DATETIME, obj.isoformat().encode())
+    raise TypeError(f"Cannot serialize {type(obj).__name__}")
+
+def _ext_hook(code, data):
+    if code == EXT_OBJECTID:
+        return ObjectId(data)
+    if code == EXT_DATETIME:
+        return datetime.fromisoformat(data.decode())
+    return msgpack.ExtType(code, data)
+
+def pack(value) -> bytes:
+    return msgpack.packb(value, default=_default, use_bin_type=True)
+
+def unpack(data: bytes):
+    return msgpack.unpackb(data, ext_hook=_ext_hook, raw=False)
@@ -0,0 +1,81 @@
+import gzip
+from starlette.datastructures import Headers, MutableHeaders
+from configure.settings import Settings
+
+try:
+    import brotli
+except ImportError:  # optional: without it responses are gzip-compressed only
+    brotli = None
+
+# Bodies smaller than this are sent as-is (compression would not pay for its CPU and headers).
+# Built-in defaults; create_app passes the application's COMPRESSION_* settings
+COMPRESSION_MIN_SIZE = Settings.compression_min_size
+GZIP_LEVEL = Settings.compression_gzip_level
+BROTLI_QUALITY = Settings.compression_brotli_quality
+COMPRESSIBLE_TYPES = ("application/json", "text/")
+
+# Best encoding the client accepts: br (when installed), then gzip; q=0 refuses one
+def choose_encoding(accept_encoding: str):
+    accepted = {}
+    for part in accept_encoding.split(','):
+        name, _, params = part.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    for encoding in (('br',) if brotli is not None else ()) + ('gzip',):
+        if accepted.get(encoding, accepted.get('*', 0)) > 0:
+            return encoding
+    return None
+
+def compress(body: bytes, encoding: str, gzip_level: int = GZIP_LEVEL, brotli_quality: int = BROTLI_QUALITY) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(body, quality=brotli_quality)
+    return gzip.compress(body, compresslevel=gzip_level, mtime=0)
+
+class CompressionMiddleware:
+    """Compress complete JSON/text responses above minimum_size; streamed bodies pass through"""
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE, gzip_level: int = GZIP_LEVEL,
+                 brotli_quality: int = BROTLI_QUALITY):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        start = None
+
+        async def send_compressed(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                # Held back until the body shows whether it is worth compressing
+                start = message
+                return
+            if message["type"] != "http.response.body" or start is None:
+                return await send(message)
+
+            response_start, start = start, None
+            headers = MutableHeaders(raw=list(response_start["headers"]))
+            body = message.get("body", b"")
+            eligible = (headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
+                        and "content-encoding" not in headers)
+            if eligible:
+                headers.add_vary_header("Accept-Encoding")
+            if eligible and encoding and not message.get("more_body") and len(body) >= self.minimum_size:
+                body = compress(body, encoding, self.gzip_level, self.brotli_quality)
+                headers["content-encoding"] = encoding
+                headers["content-length"] = str(len(body))
+                message = {**message, "body": body}
+            await send({**response_start, "headers": headers.raw})
+            await send(message)
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,26 @@
+import hashlib
+from fastapi.responses import Response
+from utils.serializer import dumps, MongoJSONResponse
+
+# Weak ETag from a version marker plus everything else that shapes the response (route, query
+# parameters). Weak, so one tag covers the gzip, brotli and identity forms of a body.
+def make_etag(*parts) -> str:
+    return 'W/"' + hashlib.blake2b(dumps(parts), digest_size=12).hexdigest() + '"'
+
+# If-None-Match check (RFC 9110: weak comparison, "*" matches any current representation)
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    if not if_none_match or not etag:
+        return False
+    opaque = etag.removeprefix('W/')
+    return any(tag.strip() == '*' or tag.strip().removeprefix('W/') == opaque
+               for tag in if_none_match.split(','))
+
+# Clients must revalidate (cheap: a 304 skips the query and the body), but may keep the copy
+def etag_headers(etag: str) -> dict:
+    return {"ETag": etag, "Cache-Control": "no-cache"} if etag else {}
+
+# Controllers return (etag, content); content None means the client's copy is current
+def conditional_response(etag: str, content, status_code: int = 200) -> Response:
+    if content is None:
+        return Response(status_code=304, headers=etag_headers(etag))
+    return MongoJSONResponse(content, status_code=status_code, headers=etag_headers(etag))
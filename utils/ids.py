@@ -0,0 +1,8 @@
+from bson import ObjectId
+
+# Canonical form for every reference stored in MongoDB (orders.user, orders.items.product, reviews.*)
+def to_object_id(value):
+    """Return value as an ObjectId, converting 24-hex strings"""
+    if isinstance(value, ObjectId):
+        return value
+    return ObjectId(value)
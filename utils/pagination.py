@@ -0,0 +1,41 @@
+import base64
+from bson import json_util
+from fastapi import HTTPException
+
+# Opaque keyset cursors: the sort-key values of the last returned document,
+# encoded as URL-safe base64 of extended JSON (keeps ObjectId/datetime types intact)
+def encode_cursor(doc, sort_fields):
+    values = [doc.get(field) for field, _ in sort_fields]
+    return base64.urlsafe_b64encode(json_util.dumps(values).encode()).decode()
+
+def decode_cursor(cursor: str, sort_fields):
+    try:
+        values = json_util.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(values, list) or len(values) != len(sort_fields):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+# Filter selecting documents strictly after the cursor position for the given sort
+def keyset_filter(sort_fields, values):
+    """(a > va) OR (a == va AND b > vb) ..., with > / < chosen per sort direction"""
+    clauses = []
+    for i, (field, direction) in enumerate(sort_fields):
+        clause = {prev_field: values[j] for j, (prev_field, _) in enumerate(sort_fields[:i])}
+        clause[field] = {"$gt" if direction == 1 else "$lt": values[i]}
+        clauses.append(clause)
+    return {"$or": clauses}
+
+# Apply an optional cursor to a base query
+def cursor_query(query, cursor, sort_fields):
+    if not cursor:
+        return query
+    return {"$and": [query, keyset_filter(sort_fields, decode_cursor(cursor, sort_fields))]}
+
+# Trim a limit+1 fetch to one page and compute the cursor for the next one
+def paginate(docs, limit, sort_fields):
+    has_more = len(docs) > limit
+    docs = docs[:limit]
+    next_cursor = encode_cursor(docs[-1], sort_fields) if has_more and docs else None
+    return docs, next_cursor
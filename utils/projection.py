@@ -0,0 +1,28 @@
+from fastapi import HTTPException
+
+# Stored field names of a response model (aliases such as `_id` included)
+def model_fields(model) -> list:
+    return [field.alias or name for name, field in model.model_fields.items()]
+
+# Fields to return: every field of the model, or the `fields=name,price` subset plus `_id`
+def select_fields(model, fields: str = None) -> list:
+    allowed = model_fields(model)
+    if not fields:
+        return allowed
+    requested = [name.strip() for name in fields.split(',') if name.strip()]
+    unknown = [name for name in requested if name not in allowed]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return ['_id'] + [name for name in requested if name != '_id']
+
+# MongoDB inclusion projection for the selected fields plus any the server needs internally
+def projection(field_names, *extra) -> dict:
+    return {name: 1 for name in [*field_names, *extra]}
+
+# Drop keys fetched only for internal use (sort keys, cursors) before responding
+def trim(docs, field_names):
+    keep = set(field_names)
+    for doc in docs:
+        for key in [key for key in doc if key not in keep]:
+            del doc[key]
+    return docs
@@ -0,0 +1,31 @@
+import time
+import orjson
+from bson import ObjectId, Decimal128
+from fastapi.responses import Response
+from services.metrics import record_serialize
+
+# Types orjson does not know; datetimes, dicts and lists are handled natively in Rust
+def _default(obj):
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, Decimal128):
+        return str(obj.to_decimal())
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+# Encode pymongo documents straight to JSON bytes in a single pass
+def dumps(content) -> bytes:
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+class MongoJSONResponse(Response):
+    """JSON response that serializes raw MongoDB documents (ObjectId, datetime) with orjson.
+
+    Routes return it directly so FastAPI skips its own jsonable_encoder pass.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        started = time.perf_counter()
+        body = dumps(content)
+        record_serialize(time.perf_counter() - started)
+        return body